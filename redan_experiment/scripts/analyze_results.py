@@ -2,49 +2,206 @@
 """
 实验结果分析工具
 分析ReDAN攻击的效果和影响
+
+子命令:
+  summary  只依赖标准库的数值摘要（不导入 pandas / matplotlib）
+  plots    渲染分析图表
+  compare  对比多个输出目录的摘要
+  report   生成综合分析报告（默认）
+
+pandas / numpy / matplotlib 只在需要它们的子命令中才导入。
 """
 
+import argparse
 import json
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
-import seaborn as sns
-from collections import defaultdict
+import math
 import os
+import sys
+from datetime import datetime
+
+from connection_monitor import availability_records
+from metrics_store import (COLLECTOR_DISTORTION_PCT, COLUMNS, COLUMN_NAMES, RunningStats,
+                           corrected_cpu, fill_forward, flatten_sample, read_columns, read_numpy)
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+SUMMARY_FIELDS = {
+    'cpu': 'cpu_percent',
+    'memory': 'memory_percent',
+    'connections': 'connections.total',
+}
+
+# 每张图表最多绘制的时间窗口数 / 降采样点数
+MAX_PLOT_POINTS = 2000
+PLOT_COLUMNS = ['cpu_percent', 'memory_percent', 'connections.total']
+COUNTER_COLUMNS = ['network_io.bytes_sent', 'network_io.bytes_recv']
+
+
+def _stats_dict(stats, ddof=1):
+    if not stats.count:
+        return {'mean': None, 'max': None, 'min': None, 'std': None}
+    denom = stats.count - ddof
+    return {
+        'mean': stats.mean,
+        'max': stats.maximum,
+        'min': stats.minimum,
+        'std': math.sqrt(stats.m2 / denom) if denom > 0 else None,
+    }
+
+
+class _OverheadStats:
+    """采集器自身开销、扣除开销后的CPU以及被扭曲样本数的增量统计"""
+
+    def __init__(self):
+        self.collector_cpu = RunningStats()
+        self.cpu_corrected = RunningStats()
+        self.distorted = 0
+        self.throttled = 0
+
+    def update(self, cpu_percent, collector_cpu_percent, throttle):
+        self.collector_cpu.update(collector_cpu_percent)
+        value, distorted = corrected_cpu(cpu_percent, collector_cpu_percent)
+        self.cpu_corrected.update(value)
+        self.distorted += distorted
+        self.throttled += throttle > 0
+
+    def as_dict(self):
+        """没有任何开销记录（旧数据）时返回 None"""
+        if not self.collector_cpu.count:
+            return None
+        return {
+            'collector_cpu': _stats_dict(self.collector_cpu),
+            'cpu_corrected': _stats_dict(self.cpu_corrected),
+            'distorted_samples': self.distorted,
+            'distorted_fraction': self.distorted / self.cpu_corrected.count,
+            'throttled_samples': self.throttled,
+        }
+
+
+def summarize_output(output_dir):
+    """
+    只用标准库计算一个输出目录的数值摘要：
+    指标优先读列式存储 system_metrics.bin，否则逐行流式读取 system_metrics.jsonl。
+    统计口径与 ReDANAnalyzer.analyze_system_performance 一致。
+    """
+    store_file = os.path.join(output_dir, 'system_metrics.bin')
+    metrics_file = os.path.join(output_dir, 'system_metrics.jsonl')
+    stats = {key: RunningStats() for key in SUMMARY_FIELDS}
+    overhead = _OverheadStats()
+    first_ts = last_ts = None
+    points = 0
+
+    if os.path.exists(store_file):
+        columns = read_columns(store_file)
+        points = len(columns['timestamp'])
+        for key, name in SUMMARY_FIELDS.items():
+            update = stats[key].update
+            for value in columns[name]:
+                update(value)
+        if 'collector.cpu_percent' in columns:
+            for row in zip(columns['cpu_percent'], columns['collector.cpu_percent'],
+                           columns['collector.throttle']):
+                overhead.update(*row)
+        if points:
+            first_ts, last_ts = columns['timestamp'][0], columns['timestamp'][-1]
+    elif os.path.exists(metrics_file):
+        index = {name: i for i, name in enumerate(COLUMN_NAMES)}
+        with open(metrics_file, 'rb') as f:
+            for sample in fill_forward(_json_loads(line) for line in f if line.strip()):
+                row = flatten_sample(sample, COLUMNS)
+                points += 1
+                for key, name in SUMMARY_FIELDS.items():
+                    stats[key].update(row[index[name]])
+                overhead.update(row[index['cpu_percent']], row[index['collector.cpu_percent']],
+                                row[index['collector.throttle']])
+                if first_ts is None:
+                    first_ts = row[0]
+                last_ts = row[0]
+
+    summary = {
+        'output_dir': output_dir,
+        'total_data_points': points,
+        'time_span': (last_ts - first_ts) if points else 0,
+        'system_performance': {
+            key: _stats_dict(stats[key], ddof=0 if key == 'connections' else 1)
+            for key in SUMMARY_FIELDS
+        },
+    }
+    if overhead.as_dict() is not None:
+        summary['collector_overhead'] = overhead.as_dict()
+
+    attack_stats_file = os.path.join(output_dir, 'attack_statistics.json')
+    if os.path.exists(attack_stats_file):
+        with open(attack_stats_file, 'r') as f:
+            attack_stats = json.load(f)
+        summary['attack_duration'] = attack_stats.get('attack_info', {}).get('duration', 0)
+        summary['total_packets_sent'] = attack_stats.get('packets', {}).get('total_packets', 0)
+
+    connection_log_file = os.path.join(output_dir, 'connection_monitor.json')
+    if os.path.exists(connection_log_file):
+        with open(connection_log_file, 'r') as f:
+            connection_log = json.load(f)
+        ports = {}
+        for entry in availability_records(connection_log):
+            counts = ports.setdefault(str(entry.get('port')), [0, 0])
+            counts[0] += 1
+            counts[1] += entry.get('status') == '正常'
+        summary['connection_success_rate'] = {
+            port: ok / total for port, (total, ok) in sorted(ports.items())
+        }
+    return summary
+
+
+def compare_summaries(summaries):
+    """以第一个摘要为参照，给出其余摘要各项均值的变化"""
+    base = summaries[0]['system_performance']
+    rows = []
+    for s in summaries:
+        row = {'output_dir': s['output_dir'], 'total_data_points': s['total_data_points']}
+        for key in SUMMARY_FIELDS:
+            mean, ref = s['system_performance'][key]['mean'], base[key]['mean']
+            row[f'{key}_mean'] = mean
+            row[f'{key}_change_pct'] = ((mean - ref) / ref * 100) if mean is not None and ref else None
+        row['connection_success_rate'] = s.get('connection_success_rate')
+        rows.append(row)
+    return rows
 
-# 设置matplotlib中文字体支持
-from matplotlib import font_manager as fm
-fm.fontManager.__init__()
-cjk_list = ['CJK', 'Han', 'CN', 'TW', 'JP']
-cjk_fonts = [f.name for f in fm.fontManager.ttflist if any(s.lower() in f.name.lower() for s in cjk_list)]
-plt.rcParams['font.family'] = ['DejaVu Sans'] + cjk_fonts
-plt.rcParams['axes.unicode_minus'] = False
 
 class ReDANAnalyzer:
-    def __init__(self, output_dir='/output'):
+    def __init__(self, output_dir='/output', render_workers=None, max_plot_points=MAX_PLOT_POINTS):
+        import pandas as pd
+
         self.output_dir = output_dir
-        self.metrics_data = []
+        self.metrics_df = pd.DataFrame(columns=COLUMN_NAMES)
         self.attack_stats = {}
         self.connection_log = []
+        self.render_workers = render_workers
+        self.max_plot_points = max_plot_points
+        self._renderer = None
+        self._plot_frames = None
         
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
-        
-        # 设置图表样式
-        plt.style.use('seaborn-v0_8')
-        sns.set_palette("husl")
+    
+    @property
+    def renderer(self):
+        """图表统一排队，由 render_figures 并行渲染并跳过未变化的图表（首次使用时才导入 matplotlib）"""
+        if self._renderer is None:
+            from report_render import FigureRenderer
+            self._renderer = FigureRenderer(self.output_dir, workers=self.render_workers)
+        return self._renderer
     
     def load_data(self):
         """加载所有数据文件"""
         # 加载系统指标数据
-        metrics_file = os.path.join(self.output_dir, 'system_metrics.jsonl')
-        if os.path.exists(metrics_file):
-            with open(metrics_file, 'r') as f:
-                for line in f:
-                    if line.strip():
-                        self.metrics_data.append(json.loads(line))
-            print(f"[*] 加载了 {len(self.metrics_data)} 个系统指标数据点")
+        self.metrics_df = self.load_metrics_frame()
+        self._plot_frames = None
+        if not self.metrics_df.empty:
+            print(f"[*] 加载了 {len(self.metrics_df)} 个系统指标数据点")
         
         # 加载攻击统计
         attack_stats_file = os.path.join(self.output_dir, 'attack_statistics.json')
@@ -60,57 +217,78 @@ class ReDANAnalyzer:
                 self.connection_log = json.load(f)
             print(f"[*] 加载了 {len(self.connection_log)} 个连接监控数据点")
     
+    def load_metrics_frame(self):
+        """
+        一次性构建展开后的指标DataFrame，所有分析方法共用。
+        优先读取列式存储 system_metrics.bin，否则单遍解析 system_metrics.jsonl。
+        """
+        import numpy as np
+        import pandas as pd
+        
+        store_file = os.path.join(self.output_dir, 'system_metrics.bin')
+        metrics_file = os.path.join(self.output_dir, 'system_metrics.jsonl')
+        
+        if os.path.exists(store_file):
+            df = pd.DataFrame(np.array(read_numpy(store_file)))
+        elif os.path.exists(metrics_file):
+            with open(metrics_file, 'rb') as f:
+                rows = [flatten_sample(sample, COLUMNS)
+                        for sample in fill_forward(_json_loads(line) for line in f if line.strip())]
+            df = pd.DataFrame.from_records(rows, columns=COLUMN_NAMES)
+        else:
+            return pd.DataFrame(columns=COLUMN_NAMES)
+        
+        df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df
+    
+    def plot_frames(self):
+        """
+        所有图表共用的聚合数据，只计算一次:
+        windows  固定时间窗口的 min/mean/max（含计数器换算的每秒速率）
+        traffic  累计流量经 LTTB 降采样后的样本
+        """
+        if self._plot_frames is None:
+            import numpy as np
+            import pandas as pd
+            from series_agg import counter_rate, lttb, window_aggregate
+            
+            df = self.metrics_df
+            t = df['timestamp'].to_numpy(dtype=float)
+            columns = {name: df[name].to_numpy(dtype=float) for name in PLOT_COLUMNS + COUNTER_COLUMNS}
+            for name in COUNTER_COLUMNS:
+                columns[name + '.rate'] = counter_rate(t, columns[name])
+            
+            agg = window_aggregate(t, columns, self.max_plot_points)
+            windows = pd.DataFrame({'datetime': pd.to_datetime(agg['t'], unit='s')})
+            for name in columns:
+                low, mean, high = agg[name]
+                windows[name] = mean
+                windows[name + '.min'] = low
+                windows[name + '.max'] = high
+            
+            keep = np.unique(np.concatenate([lttb(t, np.nan_to_num(columns[name]), self.max_plot_points)
+                                             for name in COUNTER_COLUMNS]))
+            traffic = pd.DataFrame({'datetime': pd.to_datetime(t[keep], unit='s')})
+            for name in COUNTER_COLUMNS:
+                traffic[name] = columns[name][keep]
+            self._plot_frames = {'windows': windows, 'traffic': traffic}
+        return self._plot_frames
+    
     def analyze_system_performance(self):
         """分析系统性能影响"""
-        if not self.metrics_data:
+        if self.metrics_df.empty:
             print("[-] 没有系统指标数据可供分析")
             return
         
-        # 转换为DataFrame
-        df = pd.DataFrame(self.metrics_data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-        
-        # 创建性能分析图表
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-        fig.suptitle('ReDAN攻击对系统性能的影响分析', fontsize=16, fontweight='bold')
-        
-        # CPU使用率
-        axes[0, 0].plot(df['timestamp'], df['cpu_percent'], 'r-', linewidth=2, label='CPU使用率')
-        axes[0, 0].set_title('CPU使用率变化', fontweight='bold')
-        axes[0, 0].set_ylabel('CPU使用率 (%)')
-        axes[0, 0].grid(True, alpha=0.3)
-        axes[0, 0].legend()
-        
-        # 内存使用率
-        axes[0, 1].plot(df['timestamp'], df['memory_percent'], 'b-', linewidth=2, label='内存使用率')
-        axes[0, 1].set_title('内存使用率变化', fontweight='bold')
-        axes[0, 1].set_ylabel('内存使用率 (%)')
-        axes[0, 1].grid(True, alpha=0.3)
-        axes[0, 1].legend()
-        
-        # 网络连接数
-        connection_counts = [conn['total'] for conn in df['connections']]
-        axes[1, 0].plot(df['timestamp'], connection_counts, 'g-', linewidth=2, label='总连接数')
-        axes[1, 0].set_title('网络连接数变化', fontweight='bold')
-        axes[1, 0].set_ylabel('连接数')
-        axes[1, 0].grid(True, alpha=0.3)
-        axes[1, 0].legend()
-        
-        # 网络流量
-        bytes_sent = [io['bytes_sent'] for io in df['network_io']]
-        bytes_recv = [io['bytes_recv'] for io in df['network_io']]
+        from report_render import render_system_performance
         
-        axes[1, 1].plot(df['timestamp'], bytes_sent, 'orange', linewidth=2, label='发送字节数')
-        axes[1, 1].plot(df['timestamp'], bytes_recv, 'purple', linewidth=2, label='接收字节数')
-        axes[1, 1].set_title('网络流量变化', fontweight='bold')
-        axes[1, 1].set_ylabel('字节数')
-        axes[1, 1].grid(True, alpha=0.3)
-        axes[1, 1].legend()
+        df = self.metrics_df
+        windows = self.plot_frames()['windows']
         
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.output_dir, 'system_performance_analysis.png'), 
-                   dpi=300, bbox_inches='tight')
-        plt.close()
+        self.renderer.add('system_performance_analysis.png', render_system_performance,
+                          windows[['datetime'] + [f'{name}{suffix}' for name in PLOT_COLUMNS
+                                                  for suffix in ('', '.min', '.max')] + COUNTER_COLUMNS])
+        connection_counts = df['connections.total']
         
         # 计算统计数据
         stats = {
@@ -127,13 +305,30 @@ class ReDANAnalyzer:
                 'std': df['memory_percent'].std()
             },
             'connections': {
-                'mean': np.mean(connection_counts),
-                'max': np.max(connection_counts),
-                'min': np.min(connection_counts),
-                'std': np.std(connection_counts)
+                'mean': connection_counts.mean(),
+                'max': connection_counts.max(),
+                'min': connection_counts.min(),
+                'std': connection_counts.std(ddof=0)
             }
         }
         
+        # 采集器自身开销：扣除后的CPU与被扭曲的样本（旧数据没有这些列）
+        if 'collector.cpu_percent' in df and df['collector.cpu_percent'].notna().any():
+            own = df['collector.cpu_percent']
+            corrected = (df['cpu_percent'] - own.fillna(0)).clip(lower=0)
+            distorted = own >= COLLECTOR_DISTORTION_PCT
+            stats['collector_overhead'] = {
+                'collector_cpu': {'mean': own.mean(), 'max': own.max(), 'min': own.min(), 'std': own.std()},
+                'cpu_corrected': {'mean': corrected.mean(), 'max': corrected.max(),
+                                  'min': corrected.min(), 'std': corrected.std()},
+                'distorted_samples': int(distorted.sum()),
+                'distorted_fraction': float(distorted.mean()),
+                'throttled_samples': int((df['collector.throttle'] > 0).sum()),
+            }
+            if distorted.any():
+                print(f"[!] {distorted.mean() * 100:.1f}% 的样本中采集器自身占用了不少于 "
+                      f"{COLLECTOR_DISTORTION_PCT}% 的CPU，CPU 统计另给出扣除后的值")
+        
         return stats
     
     def analyze_attack_effectiveness(self):
@@ -142,141 +337,74 @@ class ReDANAnalyzer:
             print("[-] 没有连接监控数据可供分析")
             return
         
+        import pandas as pd
+        from report_render import render_attack_effectiveness
+        from series_agg import window_aggregate
+        
         # 分析连接状态变化
-        df_connections = pd.DataFrame(self.connection_log)
-        df_connections['timestamp'] = pd.to_datetime(df_connections['timestamp'], unit='s')
+        # 连接建立 / 轮换 / 关闭等生命周期事件不是可用性样本，不计入成功率
+        df_connections = pd.DataFrame(availability_records(self.connection_log))
+        if df_connections.empty:
+            print("[-] 没有心跳记录可供分析")
+            return
+        df_connections = df_connections.sort_values('timestamp', kind='stable')
+        df_connections['ok'] = (df_connections['status'] == '正常').astype(float)
         
-        # 按端口分组分析
+        # 按端口分组，每个端口的状态序列按时间窗口聚合为“正常比例”
         ports = df_connections['port'].unique()
-        
-        fig, axes = plt.subplots(len(ports), 1, figsize=(15, 4*len(ports)))
-        if len(ports) == 1:
-            axes = [axes]
-        
-        fig.suptitle('ReDAN攻击对不同服务连接的影响', fontsize=16, fontweight='bold')
-        
-        for i, port in enumerate(ports):
+        frames = []
+        for port in ports:
             port_data = df_connections[df_connections['port'] == port]
-            
-            # 计算连接成功率
-            total_attempts = len(port_data)
-            successful_connections = len(port_data[port_data['status'] == '正常'])
-            success_rate = (successful_connections / total_attempts * 100) if total_attempts > 0 else 0
-            
-            # 绘制连接状态时间线
-            status_numeric = port_data['status'].map({'正常': 1, '失败': 0, '超时': 0})
-            
-            axes[i].plot(port_data['timestamp'], status_numeric, 'b-', linewidth=2, 
-                        label=f'端口 {port} (成功率: {success_rate:.1f}%)')
-            axes[i].set_ylabel('连接状态')
-            axes[i].set_ylim(-0.1, 1.1)
-            axes[i].grid(True, alpha=0.3)
-            axes[i].legend()
-            
-            # 添加攻击时间段标记（假设攻击在中间时段）
-            mid_time = port_data['timestamp'].iloc[len(port_data)//2]
-            axes[i].axvline(x=mid_time, color='red', linestyle='--', alpha=0.7, label='攻击时段')
-        
-        axes[-1].set_xlabel('时间')
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.output_dir, 'attack_effectiveness_analysis.png'), 
-                   dpi=300, bbox_inches='tight')
-        plt.close()
+            agg = window_aggregate(port_data['timestamp'].to_numpy(dtype=float),
+                                   {'ok': port_data['ok'].to_numpy()}, self.max_plot_points)
+            frames.append(pd.DataFrame({
+                'timestamp': pd.to_datetime(agg['t'], unit='s'),
+                'port': port,
+                'ok_rate': agg['ok'][1],
+                'success_rate': port_data['ok'].mean(),
+            }))
+        
+        self.renderer.add('attack_effectiveness_analysis.png', render_attack_effectiveness,
+                          pd.concat(frames, ignore_index=True))
         
         return {'attack_detected': True, 'affected_ports': len(ports)}
     
     def analyze_network_traffic(self):
         """分析网络流量模式"""
-        if not self.metrics_data:
+        if self.metrics_df.empty:
             return
         
-        df = pd.DataFrame(self.metrics_data)
-        
-        # 计算流量速率
-        df['bytes_sent_rate'] = df['network_io'].apply(lambda x: x['bytes_sent'])
-        df['bytes_recv_rate'] = df['network_io'].apply(lambda x: x['bytes_recv'])
-        
-        # 计算差分（流量速率）
-        df['sent_rate'] = df['bytes_sent_rate'].diff().fillna(0)
-        df['recv_rate'] = df['bytes_recv_rate'].diff().fillna(0)
-        
-        # 创建流量分析图表
-        fig, axes = plt.subplots(2, 1, figsize=(15, 10))
-        fig.suptitle('网络流量模式分析', fontsize=16, fontweight='bold')
+        from report_render import render_network_traffic
         
-        # 累积流量
-        axes[0].plot(df.index, df['bytes_sent_rate'] / (1024*1024), 'r-', 
-                    linewidth=2, label='发送流量 (MB)')
-        axes[0].plot(df.index, df['bytes_recv_rate'] / (1024*1024), 'b-', 
-                    linewidth=2, label='接收流量 (MB)')
-        axes[0].set_title('累积网络流量', fontweight='bold')
-        axes[0].set_ylabel('流量 (MB)')
-        axes[0].grid(True, alpha=0.3)
-        axes[0].legend()
-        
-        # 流量速率
-        axes[1].plot(df.index, df['sent_rate'] / 1024, 'orange', 
-                    linewidth=2, label='发送速率 (KB/s)')
-        axes[1].plot(df.index, df['recv_rate'] / 1024, 'purple', 
-                    linewidth=2, label='接收速率 (KB/s)')
-        axes[1].set_title('网络流量速率', fontweight='bold')
-        axes[1].set_ylabel('速率 (KB/s)')
-        axes[1].set_xlabel('时间序列')
-        axes[1].grid(True, alpha=0.3)
-        axes[1].legend()
-        
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.output_dir, 'network_traffic_analysis.png'), 
-                   dpi=300, bbox_inches='tight')
-        plt.close()
+        frames = self.plot_frames()
+        rate_columns = [f'{name}.rate{suffix}' for name in COUNTER_COLUMNS for suffix in ('', '.min', '.max')]
+        self.renderer.add('network_traffic_analysis.png', render_network_traffic,
+                          frames['traffic'], frames['windows'][['datetime'] + rate_columns])
     
     def generate_attack_timeline(self):
         """生成攻击时间线分析"""
-        if not self.metrics_data or not self.attack_stats:
+        if self.metrics_df.empty or not self.attack_stats:
             return
         
-        # 创建时间线图表
-        fig, ax = plt.subplots(1, 1, figsize=(15, 8))
-        
-        # 绘制关键指标
-        df = pd.DataFrame(self.metrics_data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-        
-        # 标准化数据以便在同一图表上显示
-        connection_counts = [conn['total'] for conn in df['connections']]
-        cpu_normalized = (df['cpu_percent'] - df['cpu_percent'].min()) / (df['cpu_percent'].max() - df['cpu_percent'].min())
-        memory_normalized = (df['memory_percent'] - df['memory_percent'].min()) / (df['memory_percent'].max() - df['memory_percent'].min())
-        connections_normalized = (connection_counts - np.min(connection_counts)) / (np.max(connection_counts) - np.min(connection_counts))
+        from report_render import render_attack_timeline
         
-        ax.plot(df['timestamp'], cpu_normalized, 'r-', linewidth=2, label='CPU使用率 (标准化)')
-        ax.plot(df['timestamp'], memory_normalized, 'b-', linewidth=2, label='内存使用率 (标准化)')
-        ax.plot(df['timestamp'], connections_normalized, 'g-', linewidth=2, label='连接数 (标准化)')
-        
-        # 标记攻击时间段
-        if 'attack_info' in self.attack_stats:
-            start_time = pd.to_datetime(self.attack_stats['attack_info']['start_time'], unit='s')
-            end_time = pd.to_datetime(self.attack_stats['attack_info']['end_time'], unit='s')
-            
-            ax.axvspan(start_time, end_time, alpha=0.3, color='red', label='攻击时段')
-        
-        ax.set_title('ReDAN攻击时间线分析', fontsize=16, fontweight='bold')
-        ax.set_ylabel('标准化指标值')
-        ax.set_xlabel('时间')
-        ax.grid(True, alpha=0.3)
-        ax.legend()
-        
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.output_dir, 'attack_timeline.png'), 
-                   dpi=300, bbox_inches='tight')
-        plt.close()
+        self.renderer.add('attack_timeline.png', render_attack_timeline,
+                          self.plot_frames()['windows'][['datetime'] + PLOT_COLUMNS],
+                          self.attack_stats.get('attack_info'))
+    
+    def render_figures(self):
+        """渲染已排队的图表"""
+        status = self.renderer.render()
+        for filename, state in status.items():
+            print(f"[*] {filename}: {'已渲染' if state == 'rendered' else '数据未变化，沿用缓存'}")
+        return status
     
     def generate_comprehensive_report(self):
         """生成综合分析报告"""
         report = {
             'analysis_timestamp': datetime.now().isoformat(),
             'experiment_summary': {
-                'total_data_points': len(self.metrics_data),
+                'total_data_points': len(self.metrics_df),
                 'attack_duration': self.attack_stats.get('attack_info', {}).get('duration', 0),
                 'total_packets_sent': self.attack_stats.get('packets', {}).get('total_packets', 0)
             },
@@ -286,7 +414,7 @@ class ReDANAnalyzer:
         }
         
         # 分析系统性能
-        if self.metrics_data:
+        if not self.metrics_df.empty:
             system_stats = self.analyze_system_performance()
             report['vulnerability_assessment']['system_performance'] = system_stats
         
@@ -296,13 +424,15 @@ class ReDANAnalyzer:
             report['attack_effectiveness'] = attack_effects
         
         # 分析网络流量
-        if self.metrics_data:
+        if not self.metrics_df.empty:
             self.analyze_network_traffic()
         
         # 生成攻击时间线
-        if self.metrics_data and self.attack_stats:
+        if not self.metrics_df.empty and self.attack_stats:
             self.generate_attack_timeline()
         
+        self.render_figures()
+        
         # 生成建议
         report['recommendations'] = [
             "启用NAT设备的TCP序列号验证功能",
@@ -320,9 +450,47 @@ class ReDANAnalyzer:
         print(f"[*] 综合分析报告已生成: {report_file}")
         return report
 
-def main():
+def cmd_summary(args):
+    summary = summarize_output(args.output_dir)
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    if args.save:
+        path = os.path.join(args.output_dir, 'analysis_summary.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"[*] 摘要已保存: {path}", file=sys.stderr)
+    print(text)
+
+
+def cmd_plots(args):
+    analyzer = ReDANAnalyzer(args.output_dir, render_workers=args.workers)
+    analyzer.load_data()
+    analyzer.analyze_system_performance()
+    analyzer.analyze_attack_effectiveness()
+    analyzer.analyze_network_traffic()
+    analyzer.generate_attack_timeline()
+    analyzer.render_figures()
+
+
+def cmd_compare(args):
+    rows = compare_summaries([summarize_output(d) for d in args.output_dirs])
+    if args.json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+        return
+
+    def fmt(v, spec):
+        return 'n/a' if v is None else format(v, spec)
+
+    print(f"{'output_dir':<32}{'points':>8}{'cpu%':>8}{'Δ%':>8}{'mem%':>8}{'Δ%':>8}{'conns':>8}{'Δ%':>8}")
+    for row in rows:
+        print(f"{row['output_dir']:<32}{row['total_data_points']:>8}"
+              f"{fmt(row['cpu_mean'], '.1f'):>8}{fmt(row['cpu_change_pct'], '+.1f'):>8}"
+              f"{fmt(row['memory_mean'], '.1f'):>8}{fmt(row['memory_change_pct'], '+.1f'):>8}"
+              f"{fmt(row['connections_mean'], '.1f'):>8}{fmt(row['connections_change_pct'], '+.1f'):>8}")
+
+
+def cmd_report(args):
     # 创建分析器
-    analyzer = ReDANAnalyzer('/output')
+    analyzer = ReDANAnalyzer(args.output_dir, render_workers=args.workers)
     
     # 加载数据
     analyzer.load_data()
@@ -338,5 +506,33 @@ def main():
     print("    - attack_timeline.png")
     print("    - comprehensive_analysis_report.json")
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ReDAN experiment result analysis")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--output-dir', default='/output', help='experiment output directory')
+    render = argparse.ArgumentParser(add_help=False)
+    render.add_argument('--workers', type=int, default=None, help='figure rendering processes')
+
+    sub = parser.add_subparsers(dest='command')
+    p = sub.add_parser('summary', parents=[common], help='numeric summary (standard library only)')
+    p.add_argument('--save', action='store_true', help='also write analysis_summary.json')
+    p.set_defaults(func=cmd_summary)
+    p = sub.add_parser('plots', parents=[common, render], help='render the analysis figures')
+    p.set_defaults(func=cmd_plots)
+    p = sub.add_parser('compare', help='compare the summaries of several output directories')
+    p.add_argument('output_dirs', nargs='+')
+    p.add_argument('--json', action='store_true')
+    p.set_defaults(func=cmd_compare)
+    p = sub.add_parser('report', parents=[common, render], help='full report with figures (default)')
+    p.set_defaults(func=cmd_report)
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or (argv[0] not in sub.choices and argv[0] not in ('-h', '--help')):
+        # 不带子命令时保持原有行为：生成综合分析报告
+        argv.insert(0, 'report')
+    args = parser.parse_args(argv)
+    args.func(args)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,13 +2,14 @@
 client.py
 Client script to connect to server, detect NAT type, and test DoS attack resilience.
 """
+import os
 import socket
 
 import time
 initial_port = 5001
 detection_port = 5002
 dos_port = 5003
-server_ip = "10.0.0.10"
+server_ip = os.environ.get("SERVER_IP", "10.0.0.10")
 
 
 def detect_nat_connection(server_ip, main_socket):
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+客户端服务可用性监控（asyncio）
+对实验环境中的服务保持长连接并按亚秒级间隔发送心跳:
+- HTTP: 在同一 keep-alive 连接上循环发送 HEAD 请求，测量往返时延
+- SSH 等纯TCP服务: 长连接保持空闲读，RST/EOF 到达即记录断开；
+  同时按间隔做一次握手探测时延
+每个连接维护时延直方图，并记录连接断开的精确时间。
+
+输出:
+  connection_monitor.json          逐次心跳、断开与连接生命周期记录，供 ReDANAnalyzer.analyze_attack_effectiveness
+                                   使用（成功率只统计心跳与断开）；
+                                   周期性追加到 JSON 数组末尾，内存中只保留两次刷盘之间的记录
+  connection_monitor_summary.json  每个连接的时延直方图与最近的断开事件
+"""
+
+import asyncio
+import collections
+import json
+import os
+import time
+
+STATUS_OK = '正常'
+STATUS_FAIL = '失败'
+STATUS_TIMEOUT = '超时'
+# 连接生命周期事件（建立 / 服务器轮换 / 对端正常关闭）不是可用性样本，单独标记，
+# 统计成功率时只看心跳与断开记录，否则每次断开后重连都会抬高“正常”比例
+STATUS_EVENT = '事件'
+LIFECYCLE_EVENTS = ('connect', 'rotate', 'closed')
+
+# 时延直方图桶上界（毫秒）
+BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float('inf')]
+# 摘要中保留的断开事件条数（完整记录都在 connection_monitor.json 中）
+MAX_BREAKS = 1000
+
+
+def availability_records(records):
+    """过滤出心跳与断开记录；按 event 判断，兼容生命周期事件仍记为“正常”的旧日志"""
+    return [r for r in records if r.get('event', 'heartbeat') not in LIFECYCLE_EVENTS]
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, latency_ms):
+        for i, bound in enumerate(BUCKETS_MS):
+            if latency_ms <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def quantile(self, q):
+        """按桶上界近似分位数"""
+        if not self.total:
+            return None
+        target = q * self.total
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            'buckets_ms': [b if b != float('inf') else 'inf' for b in BUCKETS_MS],
+            'counts': self.counts,
+            'total': self.total,
+            'mean_ms': self.sum_ms / self.total if self.total else None,
+            'p50_ms': self.quantile(0.5),
+            'p99_ms': self.quantile(0.99),
+            'max_ms': self.max_ms,
+        }
+
+
+class ConnectionMonitor:
+    def __init__(self, host, targets, output_dir='/output', interval=0.2, timeout=1.0,
+                 connections_per_target=1, flush_interval=5.0, max_breaks=MAX_BREAKS):
+        """
+        targets: [(服务名, 端口, 'http'|'tcp'), ...]
+        """
+        self.host = host
+        self.targets = targets
+        self.output_dir = output_dir
+        self.interval = interval
+        self.timeout = timeout
+        self.connections_per_target = connections_per_target
+        self.flush_interval = flush_interval
+        # 尚未写盘的记录；已写出的条数与数组结尾 "\n]\n" 在文件中的偏移
+        self.records = []
+        self.record_count = 0
+        self._log = None
+        self._log_tail = 0
+        self.breaks = collections.deque(maxlen=max_breaks)
+        self.break_count = 0
+        self.histograms = {}
+
+    def record(self, conn_id, service, port, status, latency_ms=None, event='heartbeat'):
+        now = time.time()
+        self.records.append({
+            'timestamp': now,
+            'service': service,
+            'port': port,
+            'conn_id': conn_id,
+            'event': event,
+            'status': status,
+            'latency_ms': latency_ms,
+        })
+        if latency_ms is not None:
+            self.histograms.setdefault(conn_id, LatencyHistogram()).add(latency_ms)
+        return now
+
+    def record_break(self, conn_id, service, port, reason, status=STATUS_FAIL):
+        ts = self.record(conn_id, service, port, status, event=reason)
+        self.break_count += 1
+        self.breaks.append({'timestamp': ts, 'conn_id': conn_id, 'service': service,
+                            'port': port, 'reason': reason})
+        print(f"[{service}:{conn_id}] 连接中断 ({reason}) @ {ts:.6f}")
+
+    async def _connect(self, port):
+        start = time.perf_counter()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, port), self.timeout)
+        return reader, writer, (time.perf_counter() - start) * 1000
+
+    async def http_session(self, service, port, conn_id):
+        """在 keep-alive 连接上循环发送 HEAD 心跳"""
+        request = (f"HEAD / HTTP/1.1\r\nHost: {self.host}\r\nConnection: keep-alive\r\n\r\n").encode()
+        while True:
+            try:
+                reader, writer, connect_ms = await self._connect(port)
+            except asyncio.TimeoutError:
+                self.record_break(conn_id, service, port, 'connect_timeout', STATUS_TIMEOUT)
+                await asyncio.sleep(self.interval)
+                continue
+            except OSError:
+                self.record_break(conn_id, service, port, 'connect_failed')
+                await asyncio.sleep(self.interval)
+                continue
+            self.record(conn_id, service, port, STATUS_EVENT, connect_ms, event='connect')
+
+            try:
+                while True:
+                    start = time.perf_counter()
+                    writer.write(request)
+                    await writer.drain()
+                    header = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.timeout)
+                    latency_ms = (time.perf_counter() - start) * 1000
+                    self.record(conn_id, service, port, STATUS_OK, latency_ms)
+                    if b'connection: close' in header.lower():
+                        # 服务器按 keep-alive 上限正常轮换连接，不算中断
+                        self.record(conn_id, service, port, STATUS_EVENT, event='rotate')
+                        break
+                    await asyncio.sleep(self.interval)
+            except asyncio.TimeoutError:
+                self.record_break(conn_id, service, port, 'heartbeat_timeout', STATUS_TIMEOUT)
+            except asyncio.IncompleteReadError:
+                self.record_break(conn_id, service, port, 'eof')
+            except ConnectionResetError:
+                self.record_break(conn_id, service, port, 'reset')
+            except OSError as e:
+                self.record_break(conn_id, service, port, f'error:{e.errno}')
+            finally:
+                writer.close()
+            await asyncio.sleep(self.interval)
+
+    async def tcp_session(self, service, port, conn_id):
+        """长连接空闲读以捕获 RST/EOF，另按间隔做握手探测"""
+        while True:
+            try:
+                reader, writer, connect_ms = await self._connect(port)
+            except asyncio.TimeoutError:
+                self.record_break(conn_id, service, port, 'connect_timeout', STATUS_TIMEOUT)
+                await asyncio.sleep(self.interval)
+                continue
+            except OSError:
+                self.record_break(conn_id, service, port, 'connect_failed')
+                await asyncio.sleep(self.interval)
+                continue
+            self.record(conn_id, service, port, STATUS_EVENT, connect_ms, event='connect')
+
+            probe = asyncio.ensure_future(self._handshake_probe(service, port, conn_id))
+            try:
+                while True:
+                    data = await reader.read(4096)
+                    if not data:
+                        # 空闲连接被对端正常关闭（如 sshd LoginGraceTime），重新建立
+                        self.record(conn_id, service, port, STATUS_EVENT, event='closed')
+                        break
+            except ConnectionResetError:
+                self.record_break(conn_id, service, port, 'reset')
+            except OSError as e:
+                self.record_break(conn_id, service, port, f'error:{e.errno}')
+            finally:
+                probe.cancel()
+                writer.close()
+            await asyncio.sleep(self.interval)
+
+    async def _handshake_probe(self, service, port, conn_id):
+        probe_id = conn_id + ':probe'
+        while True:
+            try:
+                _, writer, connect_ms = await self._connect(port)
+                writer.close()
+                self.record(probe_id, service, port, STATUS_OK, connect_ms)
+            except asyncio.TimeoutError:
+                self.record(probe_id, service, port, STATUS_TIMEOUT)
+            except OSError:
+                self.record(probe_id, service, port, STATUS_FAIL)
+            await asyncio.sleep(self.interval)
+
+    def summary(self):
+        return {
+            'host': self.host,
+            'interval': self.interval,
+            'timeout': self.timeout,
+            'records': self.record_count + len(self.records),
+            'connections': {conn_id: h.as_dict() for conn_id, h in self.histograms.items()},
+            'break_count': self.break_count,
+            'breaks': list(self.breaks),
+        }
+
+    def _write_json(self, name, data):
+        path = os.path.join(self.output_dir, name)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _append_records(self):
+        """
+        把新记录追加到 connection_monitor.json 的数组末尾：覆盖结尾的 "\n]\n" 后重新写上，
+        每次只写新增部分，两次刷盘之间文件始终是完整的 JSON 数组。
+        """
+        if self._log is None:
+            self._log = open(os.path.join(self.output_dir, 'connection_monitor.json'), 'wb')
+            self._log.write(b'[\n]\n')
+            self._log_tail = 1
+        chunk = b''.join((b',\n' if self.record_count + i else b'\n')
+                         + json.dumps(r, ensure_ascii=False).encode('utf-8')
+                         for i, r in enumerate(self.records))
+        self._log.seek(self._log_tail)
+        self._log.write(chunk + b'\n]\n')
+        self._log.flush()
+        self._log_tail += len(chunk)
+        self.record_count += len(self.records)
+        self.records = []
+
+    def flush(self):
+        self._append_records()
+        self._write_json('connection_monitor_summary.json', self.summary())
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    async def run(self, duration=None):
+        os.makedirs(self.output_dir, exist_ok=True)
+        sessions = []
+        for service, port, kind in self.targets:
+            session = self.http_session if kind == 'http' else self.tcp_session
+            for n in range(self.connections_per_target):
+                sessions.append(asyncio.ensure_future(session(service, port, f"{service}-{n}")))
+        flusher = asyncio.ensure_future(self._flusher())
+        try:
+            if duration is None:
+                await asyncio.gather(*sessions)
+            else:
+                await asyncio.wait(sessions, timeout=duration)
+        finally:
+            for task in sessions + [flusher]:
+                task.cancel()
+            await asyncio.gather(*sessions, flusher, return_exceptions=True)
+            self.flush()
+            self._log.close()
+            self._log = None
+
+
+def main():
+    host = os.environ.get('SERVER_IP', '10.0.0.10')
+    targets = [('http', 80, 'http'), ('ssh', 22, 'tcp')]
+    monitor = ConnectionMonitor(host, targets)
+    print(f"[*] 监控 {host} 上的服务: {', '.join(f'{s}:{p}' for s, p, _ in targets)}")
+    try:
+        asyncio.run(monitor.run())
+    except KeyboardInterrupt:
+        print("\n[*] 监控已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+NAT 容器内常驻的 conntrack 查询代理
+由 evaluation_harness 通过一次 `docker exec -i` 启动，之后通过 stdin/stdout
+按行交换 JSON，避免每次查询都新建 docker exec 进程和转储整张表。
+
+请求: {"id": 1, "op": "query", "src": "192.168.1.100", "dst": "10.0.0.10", "dport": 5003}
+      {"id": 2, "op": "dump"}
+      {"id": 3, "op": "ping"}
+      {"id": 4, "op": "watch", "src": ..., "dst": ..., "dport": ...}
+      {"id": 5, "op": "unwatch", "watch": 4}
+应答: {"id": 1, "ok": true, "ts": 1700000000.0, "rows": ["tcp 6 431999 ESTABLISHED src=..."]}
+事件: {"event": true, "watch": 4, "ts": 1700000000.123456, "type": "UPDATE", "state": "CLOSE", "raw": "..."}
+      watch 启动的 conntrack -E 每产生一行就推送一条事件，直到 unwatch。
+      watch 的应答在 conntrack -E 的 netlink 套接字加入事件组之后才发出，
+      调用方收到应答即可开始触发流量，不会丢失最初的 NEW / UPDATE / DESTROY 事件。
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+PROC_CONNTRACK = '/proc/net/nf_conntrack'
+NETLINK_NETFILTER = 12
+# 等待 conntrack -E 完成事件订阅的上限（秒）
+SUBSCRIBE_TIMEOUT = 3.0
+
+TCP_CT_STATES = {
+    "NONE", "SYN_SENT", "SYN_RECV", "ESTABLISHED", "FIN_WAIT",
+    "CLOSE_WAIT", "LAST_ACK", "TIME_WAIT", "CLOSE", "SYN_SENT2"
+}
+# conntrack -E -o timestamp 的输出: "[1700000000.123456]\t [UPDATE] tcp 6 10 CLOSE src=..."
+EVENT_RE = re.compile(r'^\s*\[(?P<ts>\d+\.\d+)\]\s*\[(?P<type>[A-Z]+)\]\s*(?P<body>.*)$')
+
+
+def orig_tuple(line):
+    """
+    条目中原始方向的元组：第一组 src= / dst= / sport= / dport=（其后的第二组是应答方向）。
+    """
+    fields = {}
+    for tok in line.split():
+        key, sep, value = tok.partition('=')
+        if sep and key in ('src', 'dst', 'sport', 'dport'):
+            if key in fields:
+                break
+            fields[key] = value
+    return fields
+
+
+def parse_event(line):
+    """解析一行 conntrack 事件，返回 (时间戳, 事件类型, TCP状态或None)"""
+    m = EVENT_RE.match(line)
+    if not m:
+        return None
+    state = None
+    for tok in m.group('body').split():
+        if tok in TCP_CT_STATES:
+            state = tok
+            break
+        if tok.startswith('src='):
+            break
+    return float(m.group('ts')), m.group('type'), state
+
+
+def socket_inodes(pid):
+    """进程打开的全部 socket 的 inode"""
+    inodes = set()
+    fd_dir = f'/proc/{pid}/fd'
+    for fd in os.listdir(fd_dir):
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+        except OSError:
+            continue
+        if target.startswith('socket:['):
+            inodes.add(target[8:-1])
+    return inodes
+
+
+def netfilter_subscribed(pid):
+    """
+    进程是否已有加入了多播组的 NETLINK_NETFILTER 套接字。
+    /proc/<pid>/net/netlink 每行: sk Eth Pid Groups Rmem Wmem Dump Locks Drops Inode
+    """
+    inodes = socket_inodes(pid)
+    with open(f'/proc/{pid}/net/netlink', 'r') as f:
+        next(f, None)
+        for line in f:
+            parts = line.split()
+            if (len(parts) >= 10 and int(parts[1]) == NETLINK_NETFILTER
+                    and int(parts[3], 16) != 0 and parts[-1] in inodes):
+                return True
+    return False
+
+
+class ConntrackAgent:
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.write_lock = threading.Lock()
+        self.use_proc = os.access(PROC_CONNTRACK, os.R_OK)
+        self.watches = {}
+
+    def send(self, message):
+        line = json.dumps(message)
+        with self.write_lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def query_rows(self, src, dst, dport, proto='tcp'):
+        """只返回与 (src, dst, dport) 匹配的条目（按原始方向）"""
+        if self.use_proc:
+            # 进程内读取，无需启动任何子进程；逐字段比较原始方向元组，
+            # 避免 dport=5003 的子串匹配命中 dport=50031 或应答方向的端口
+            want = {'src': src, 'dst': dst, 'dport': str(dport)}
+            rows = []
+            with open(PROC_CONNTRACK, 'r') as f:
+                for line in f:
+                    if f" {proto} " not in line:
+                        continue
+                    orig = orig_tuple(line)
+                    if all(orig.get(k) == v for k, v in want.items()):
+                        rows.append(line.rstrip('\n'))
+            return rows
+        # 由内核完成过滤，只传回匹配的条目
+        cmd = ['conntrack', '-L', '-p', proto, '--orig-src', src, '--orig-dst', dst,
+               '--orig-port-dst', str(dport)]
+        p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                           universal_newlines=True)
+        return [line for line in p.stdout.splitlines() if line.strip()]
+
+    def dump_rows(self):
+        if self.use_proc:
+            with open(PROC_CONNTRACK, 'r') as f:
+                return [line.rstrip('\n') for line in f]
+        p = subprocess.run(['conntrack', '-L'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                           universal_newlines=True)
+        return [line for line in p.stdout.splitlines() if line.strip()]
+
+    def start_watch(self, watch_id, src, dst, dport, proto='tcp'):
+        """为一条流启动 conntrack -E，事件由后台线程逐行推送"""
+        cmd = ['conntrack', '-E', '-o', 'timestamp', '-p', proto, '--orig-src', src,
+               '--orig-dst', dst, '--orig-port-dst', str(dport)]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True, bufsize=1)
+        self.watches[watch_id] = proc
+        thread = threading.Thread(target=self._forward_events, args=(watch_id, proc), daemon=True)
+        thread.start()
+        try:
+            self._wait_subscribed(proc)
+        except Exception:
+            self.stop_watch(watch_id)
+            raise
+
+    def _wait_subscribed(self, proc):
+        """Popen 返回时 conntrack 还没有订阅事件，轮询其 netlink 套接字直到加入事件组"""
+        deadline = time.time() + SUBSCRIBE_TIMEOUT
+        while time.time() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f'conntrack -E exited with {proc.returncode}')
+            try:
+                if netfilter_subscribed(proc.pid):
+                    return
+            except (OSError, ValueError):
+                # 读不到 /proc 时无法确认，退化为短暂等待
+                time.sleep(0.2)
+                return
+            time.sleep(0.005)
+        raise RuntimeError(f'conntrack -E did not subscribe within {SUBSCRIBE_TIMEOUT:.1f}s')
+
+    def _forward_events(self, watch_id, proc):
+        for line in proc.stdout:
+            parsed = parse_event(line)
+            if parsed is None:
+                continue
+            ts, event_type, state = parsed
+            self.send({'event': True, 'watch': watch_id, 'ts': ts, 'type': event_type,
+                       'state': state, 'raw': line.strip()})
+
+    def stop_watch(self, watch_id):
+        proc = self.watches.pop(watch_id, None)
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    def handle(self, request):
+        op = request.get('op')
+        reply = {'id': request.get('id'), 'ok': True}
+        if op == 'query':
+            reply['rows'] = self.query_rows(request['src'], request['dst'], int(request['dport']),
+                                            request.get('proto', 'tcp'))
+        elif op == 'dump':
+            reply['rows'] = self.dump_rows()
+        elif op == 'watch':
+            self.start_watch(request['id'], request['src'], request['dst'], int(request['dport']),
+                             request.get('proto', 'tcp'))
+            reply['watch'] = request['id']
+        elif op == 'unwatch':
+            self.stop_watch(request['watch'])
+        elif op == 'ping':
+            pass
+        else:
+            raise ValueError(f"unknown op: {op}")
+        reply['ts'] = time.time()
+        return reply
+
+    def serve(self, stream=sys.stdin):
+        self.send({'id': None, 'ok': True, 'ready': True, 'proc': self.use_proc})
+        for line in stream:
+            if not line.strip():
+                continue
+            request = {}
+            try:
+                request = json.loads(line)
+                self.send(self.handle(request))
+            except Exception as e:
+                self.send({'id': request.get('id'), 'ok': False, 'error': str(e)})
+        for watch_id in list(self.watches):
+            self.stop_watch(watch_id)
+
+
+if __name__ == "__main__":
+    ConntrackAgent().serve()
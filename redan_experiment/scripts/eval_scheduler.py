@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+ReDAN 多环境并行评估调度
+- 为每种 NAT 配置（nat_device 下的不同 Dockerfile）拉起若干份互相隔离的
+  docker-compose 实验环境（独立 project 名、容器名前缀、子网与端口）
+- 环境通过就绪探测（client 默认路由、conntrack agent ping、经 NAT 可达 server 端口）
+  后才交给 worker；超时未就绪的环境跳过，其 trial 由同配置的其他副本承担
+- 每个环境一个 worker，从所属配置的 trial 队列中取任务，环境内 trial 串行执行
+- 结束后合并所有 TrialResult，按配置分别统计
+
+用法（在 redan_experiment 目录下）:
+    python3 scripts/eval_scheduler.py --trials 20 --replicas 2 \
+        --config ubuntu20.04=Dockerfile --config ubuntu18.04=Dockerfile-lowVersion
+"""
+
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from evaluation_harness import (ConntrackAgentClient, ConntrackEvaluator, ExperimentDriver,
+                                FlowKey, TrialResult, run_trial, summarize)
+from evidence_archive import EvidenceArchive
+
+COMPOSE_CMD = os.environ.get("COMPOSE_CMD", "docker-compose").split()
+DEFAULT_CONFIGS = {
+    "ubuntu20.04": "Dockerfile",
+    "ubuntu18.04": "Dockerfile-lowVersion",
+}
+# 就绪探测连接的 server 端口：用 server.py 的 initial_port（回显），
+# 不碰 trial 观察的 dos_port，避免在被测 flow 上留下 conntrack 条目
+PROBE_PORT = 5001
+# 同一环境连续这么多个 trial 出错（agent 超时、docker exec 失败等）即视为环境故障，停止其 worker
+MAX_CONSECUTIVE_ERRORS = 3
+
+
+@dataclass
+class LabEnvironment:
+    """一份独立的 compose 实验环境；index 决定其子网与宿主机端口。"""
+    config: str
+    nat_dockerfile: str
+    index: int
+    compose_dir: str = "."
+
+    @property
+    def name(self) -> str:
+        return f"{self.config}-{self.index}"
+
+    @property
+    def project(self) -> str:
+        return "redan_" + "".join(c if c.isalnum() else "_" for c in self.name).lower()
+
+    @property
+    def prefix(self) -> str:
+        return self.project + "_"
+
+    @property
+    def internal_net(self) -> str:
+        # 默认实验环境占用 192.168.1.0/24 与 10.0.0.0/24，这里从 .10 开始避开
+        return f"192.168.{10 + self.index}"
+
+    @property
+    def external_net(self) -> str:
+        return f"10.0.{10 + self.index}"
+
+    @property
+    def nat_container(self) -> str:
+        return self.prefix + "nat_container"
+
+    @property
+    def client_container(self) -> str:
+        return self.prefix + "client_container"
+
+    @property
+    def server_container(self) -> str:
+        return self.prefix + "server_container"
+
+    @property
+    def flow(self) -> FlowKey:
+        return FlowKey(client_ip=f"{self.internal_net}.100", server_ip=f"{self.external_net}.10", dport=5003)
+
+    def compose_env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        base_port = 18000 + self.index * 10
+        env.update({
+            "NAT_DOCKERFILE": self.nat_dockerfile,
+            "LAB_PREFIX": self.prefix,
+            "LAB_INTERNAL_NET": self.internal_net,
+            "LAB_EXTERNAL_NET": self.external_net,
+            "LAB_HTTP_PORT": str(base_port),
+            "LAB_SSH_PORT": str(base_port + 1),
+            "LAB_FTP_PORT": str(base_port + 2),
+            "LAB_LOGS": f"./logs/{self.name}",
+            "LAB_OUTPUT": f"./output/{self.name}",
+        })
+        return env
+
+    def _compose(self, *args: str) -> None:
+        cmd = COMPOSE_CMD + ["-p", self.project] + list(args)
+        p = subprocess.run(cmd, cwd=self.compose_dir, env=self.compose_env(),
+                           capture_output=True, text=True)
+        if p.returncode != 0:
+            raise RuntimeError(f"[{self.name}] {' '.join(cmd)} failed:\n{p.stderr}")
+
+    def up(self) -> None:
+        for sub in ("logs", "output"):
+            os.makedirs(os.path.join(self.compose_dir, sub, self.name), exist_ok=True)
+        self._compose("up", "-d", "--build")
+
+    def down(self) -> None:
+        self._compose("down")
+
+    def _docker_exec(self, container: str, cmd: str, timeout: float = 10.0) -> bool:
+        full = ["docker", "exec", "-i", container, "sh", "-lc", cmd]
+        try:
+            p = subprocess.run(full, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return False
+        return p.returncode == 0
+
+    def probe(self, driver: ExperimentDriver) -> Optional[str]:
+        """执行一轮就绪探测；全部通过返回 None，否则返回第一项失败原因。"""
+        gateway = f"{self.internal_net}.2"
+        # client_setup.sh 把默认路由改到 NAT 网关之后 client 流量才会经过 NAT
+        if not self._docker_exec(self.client_container,
+                                 f"ip route show default | grep -q 'via {gateway} '"):
+            return f"client default route via {gateway} missing"
+        try:
+            agent = ConntrackAgentClient(self.nat_container, timeout=5.0)
+        except (OSError, RuntimeError) as e:
+            return f"conntrack agent not ready: {e}"
+        try:
+            agent.request("ping")
+        except RuntimeError as e:
+            return str(e)
+        finally:
+            agent.close()
+        try:
+            driver.ensure_server_running()
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            return f"server not started: {e}"
+        # 从 client 经 NAT 建连，同时验证 nat_setup.sh 的 iptables 规则与 server 监听
+        server_ip = self.flow.server_ip
+        if not self._docker_exec(self.client_container, f"nc -z -w 2 {server_ip} {PROBE_PORT}"):
+            return f"{server_ip}:{PROBE_PORT} unreachable through NAT"
+        return None
+
+    def wait_ready(self, timeout: float = 120.0, interval: float = 2.0) -> None:
+        """轮询就绪探测直到通过；超时抛出 RuntimeError 并带上最后一次失败原因。"""
+        driver = ExperimentDriver(self.client_container, self.server_container)
+        deadline = time.monotonic() + timeout
+        while True:
+            reason = self.probe(driver)
+            if reason is None:
+                return
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"[{self.name}] not ready after {timeout:.0f}s: {reason}")
+            time.sleep(interval)
+
+
+class EvaluationScheduler:
+    def __init__(self, environments: List[LabEnvironment], trials_per_config: int,
+                 out_dir: str = "./output/eval", mode: str = "event", event_timeout: float = 10.0,
+                 sleep_between: float = 2.0, ready_timeout: float = 120.0):
+        self.environments = environments
+        self.trials_per_config = trials_per_config
+        self.out_dir = out_dir
+        self.mode = mode
+        self.event_timeout = event_timeout
+        self.sleep_between = sleep_between
+        self.ready_timeout = ready_timeout
+        self.results: List[TrialResult] = []
+        self._lock = threading.Lock()
+        self.archive: Optional[EvidenceArchive] = None
+        # 出错的 trial 与被放弃的环境，写入 summary.json 便于事后排查
+        self.errors: List[dict] = []
+        self.failed_environments: Dict[str, str] = {}
+        # 同一配置的多个副本共享一个 trial 队列
+        self.queues: Dict[str, "queue.Queue[int]"] = {}
+        for env in environments:
+            if env.config not in self.queues:
+                q: "queue.Queue[int]" = queue.Queue()
+                for i in range(1, trials_per_config + 1):
+                    q.put(i)
+                self.queues[env.config] = q
+
+    def _worker(self, env: LabEnvironment) -> None:
+        evaluator = ConntrackEvaluator(env.nat_container, env.flow,
+                                       out_dir=os.path.join(self.out_dir, env.name))
+        # server.py 已在就绪探测中启动
+        driver = ExperimentDriver(env.client_container, env.server_container)
+        trials = self.queues[env.config]
+        consecutive_errors = 0
+        try:
+            while True:
+                try:
+                    i = trials.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    r = run_trial(i, evaluator, driver, mode=self.mode, event_timeout=self.event_timeout,
+                                  archive=self.archive, environment=env.name)
+                except Exception as e:
+                    # 单个 trial 出错不影响其他环境；该 trial 记为错误，不计入成功率
+                    consecutive_errors += 1
+                    print(f"[!] {env.name} trial {i:03d} failed: {e}")
+                    with self._lock:
+                        self.errors.append({"environment": env.name, "trial_id": i, "error": str(e)})
+                    if consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                        self._mark_failed(env, f"{consecutive_errors} consecutive trial errors, last: {e}")
+                        break
+                    continue
+                consecutive_errors = 0
+                with self._lock:
+                    self.results.append(r)
+                print(f"[{env.name} trial {i:03d}] before={r.flow_state_before} "
+                      f"after={r.flow_state_after} dos_observed={r.dos_observed}")
+                if not trials.empty():
+                    time.sleep(self.sleep_between)
+        finally:
+            evaluator.close()
+
+    def _run_worker(self, env: LabEnvironment) -> None:
+        """worker 的外层保护：环境级异常只让该环境失败，其余 trial 由同配置的其他副本继续"""
+        try:
+            self._worker(env)
+        except Exception as e:
+            self._mark_failed(env, str(e))
+
+    def _mark_failed(self, env: LabEnvironment, reason: str) -> None:
+        print(f"[!] giving up on {env.name}: {reason}")
+        with self._lock:
+            self.failed_environments[env.name] = reason
+
+    def _tear_down(self, env: LabEnvironment) -> None:
+        try:
+            env.down()
+        except RuntimeError as e:
+            print(f"[!] {e}")
+
+    def _bring_up(self, env: LabEnvironment) -> bool:
+        """启动环境并等待就绪；失败时打印原因并返回 False，由调用方跳过该环境。"""
+        try:
+            env.up()
+            env.wait_ready(timeout=self.ready_timeout)
+        except RuntimeError as e:
+            print(f"[!] skipping {env.name}: {e}")
+            with self._lock:
+                self.failed_environments[env.name] = str(e)
+            return False
+        print(f"[*] {env.name} ready")
+        return True
+
+    def run(self, keep_up: bool = False) -> dict:
+        """执行全部 trial；无论中途是否出错，都会按已收集的结果写出 summary.json"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        # 所有环境共用一个归档，按 (environment, trial_id) 区分
+        self.archive = EvidenceArchive(os.path.join(self.out_dir, "evidence.sqlite"))
+        try:
+            # 构建/启动各环境本身也并行进行，只有通过就绪探测的环境才交给 worker
+            with ThreadPoolExecutor(max_workers=len(self.environments)) as pool:
+                ready = list(pool.map(self._bring_up, self.environments))
+            ready_envs = [e for e, ok in zip(self.environments, ready) if ok]
+            if not ready_envs:
+                raise RuntimeError("no lab environment became ready")
+            for config in self.queues:
+                if not any(e.config == config for e in ready_envs):
+                    print(f"[!] no ready environment for {config}, its trials are skipped")
+            with ThreadPoolExecutor(max_workers=len(ready_envs)) as pool:
+                list(pool.map(self._run_worker, ready_envs))
+        finally:
+            self.archive.close()
+            try:
+                if not keep_up:
+                    with ThreadPoolExecutor(max_workers=len(self.environments)) as pool:
+                        list(pool.map(self._tear_down, self.environments))
+            finally:
+                summary = self.merge()
+        return summary
+
+    def merge(self) -> dict:
+        results = sorted(self.results, key=lambda r: (r.environment, r.trial_id))
+        summary = summarize(results, include_results=False)
+        if self.archive is not None:
+            summary["evidence_archive"] = os.path.basename(self.archive.path)
+        summary["errors"] = sorted(self.errors, key=lambda e: (e["environment"], e["trial_id"]))
+        summary["failed_environments"] = dict(sorted(self.failed_environments.items()))
+        env_by_name = {e.name: e for e in self.environments}
+        summary["configs"] = {}
+        for config in self.queues:
+            envs = [e for e in self.environments if e.config == config]
+            s = summarize([r for r in results if env_by_name[r.environment].config == config],
+                          include_results=False)
+            s["nat_dockerfile"] = envs[0].nat_dockerfile
+            s["environments"] = [e.name for e in envs]
+            summary["configs"][config] = s
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        with open(os.path.join(self.out_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def build_environments(configs: Dict[str, str], replicas: int, compose_dir: str) -> List[LabEnvironment]:
+    envs = []
+    for config, dockerfile in configs.items():
+        for _ in range(replicas):
+            envs.append(LabEnvironment(config, dockerfile, index=len(envs), compose_dir=compose_dir))
+    return envs
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run ReDAN evaluation trials across parallel lab copies")
+    parser.add_argument("--config", action="append", default=[],
+                        help="NAME=DOCKERFILE under nat_device/ (repeatable)")
+    parser.add_argument("--replicas", type=int, default=1, help="lab copies per config")
+    parser.add_argument("--trials", type=int, default=20, help="trials per config")
+    parser.add_argument("--mode", choices=["event", "snapshot"], default="event")
+    parser.add_argument("--event-timeout", type=float, default=10.0)
+    parser.add_argument("--ready-timeout", type=float, default=120.0,
+                        help="seconds to wait for each lab to pass the readiness probe")
+    parser.add_argument("--out-dir", default="./output/eval")
+    parser.add_argument("--compose-dir", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--keep-up", action="store_true", help="leave the labs running afterwards")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configs = dict(c.split("=", 1) for c in args.config) if args.config else DEFAULT_CONFIGS
+    envs = build_environments(configs, args.replicas, args.compose_dir)
+    print(f"[*] {len(envs)} lab environments: {', '.join(e.name for e in envs)}")
+
+    scheduler = EvaluationScheduler(envs, args.trials, out_dir=args.out_dir, mode=args.mode,
+                                    event_timeout=args.event_timeout,
+                                    ready_timeout=args.ready_timeout)
+    summary = scheduler.run(keep_up=args.keep_up)
+
+    for config, s in summary["configs"].items():
+        print(f"[+] {config}: success={s['success']}/{s['trials']} rate={s['success_rate']:.3f}")
+    for name, reason in summary["failed_environments"].items():
+        print(f"[!] {name} failed: {reason}")
+    if summary["errors"]:
+        print(f"[!] {len(summary['errors'])} trials errored (see summary.json)")
+    print(f"[+] Merged summary written to {os.path.join(args.out_dir, 'summary.json')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,12 +9,18 @@ ReDAN 实验评估驱动（安全版）
   3) 统计成功率、保存证据用于报告
 """
 
+import itertools
 import json
 import os
+import queue
+import re
 import subprocess
+import threading
 import time
-from dataclasses import dataclass, asdict
-from typing import List, Optional
+from dataclasses import dataclass, asdict, field
+from typing import Dict, List, Optional
+
+from evidence_archive import EvidenceArchive
 
 
 @dataclass
@@ -35,14 +41,155 @@ class TrialResult:
     flow_state_after: Optional[str]
     dos_observed: bool
     notes: str
+    mode: str = "snapshot"
+    # event 模式下记录该 flow 的每次状态迁移 {"ts","type","state","sport"}
+    transitions: List[dict] = field(default_factory=list)
+    time_to_teardown: Optional[float] = None
+    environment: str = ""
+
+
+# 出现这些迁移即认为本次 trial 的 flow 已结束
+TEARDOWN_STATES = {"CLOSE"}
+SPORT_RE = re.compile(r"\bsport=(\d+)")
+GRACEFUL_STATES = {"FIN_WAIT", "CLOSE_WAIT", "LAST_ACK", "TIME_WAIT"}
+
+
+class FlowWatch:
+    """一次 conntrack -E 订阅；事件按到达顺序放入 events 队列。"""
+    def __init__(self, client: "ConntrackAgentClient", watch_id: int):
+        self.client = client
+        self.watch_id = watch_id
+        self.events: "queue.Queue[dict]" = queue.Queue()
+
+    def stop(self) -> None:
+        self.client.unwatch(self)
+
+
+class ConntrackAgentClient:
+    """
+    与 NAT 容器内 conntrack_agent.py 之间的持久通道。
+    只启动一次 docker exec，之后每次查询只是一行 JSON 往返。
+    """
+    def __init__(self, nat_container: str, agent_path: str = "/scripts/conntrack_agent.py",
+                 timeout: float = 10.0):
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, "queue.Queue[dict]"] = {}
+        self._watches: Dict[int, FlowWatch] = {}
+        self._lock = threading.Lock()
+        self.proc = subprocess.Popen(
+            ["docker", "exec", "-i", nat_container, "python3", "-u", agent_path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1,
+        )
+        self._ready: "queue.Queue[dict]" = queue.Queue()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        try:
+            self._ready.get(timeout=self.timeout)
+        except queue.Empty:
+            self.close()
+            raise RuntimeError(f"conntrack agent did not start in {nat_container}")
+
+    def _read_loop(self) -> None:
+        for line in self.proc.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            self._dispatch(msg)
+
+    def _dispatch(self, msg: dict) -> None:
+        if msg.get("ready"):
+            self._ready.put(msg)
+            return
+        if msg.get("event"):
+            with self._lock:
+                watch = self._watches.get(msg.get("watch"))
+            if watch is not None:
+                watch.events.put(msg)
+            return
+        with self._lock:
+            waiter = self._pending.pop(msg.get("id"), None)
+        if waiter is not None:
+            waiter.put(msg)
+
+    def request(self, op: str, **params) -> dict:
+        req_id = next(self._ids)
+        waiter: "queue.Queue[dict]" = queue.Queue(maxsize=1)
+        with self._lock:
+            self._pending[req_id] = waiter
+        self.proc.stdin.write(json.dumps(dict(params, id=req_id, op=op)) + "\n")
+        self.proc.stdin.flush()
+        try:
+            reply = waiter.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._pending.pop(req_id, None)
+            raise RuntimeError(f"conntrack agent timed out on {op}")
+        if not reply.get("ok"):
+            raise RuntimeError(f"conntrack agent error on {op}: {reply.get('error')}")
+        return reply
+
+    def query_flow(self, flow: FlowKey) -> List[str]:
+        return self.request("query", src=flow.client_ip, dst=flow.server_ip, dport=flow.dport)["rows"]
+
+    def dump(self) -> List[str]:
+        return self.request("dump")["rows"]
+
+    def watch(self, flow: FlowKey) -> FlowWatch:
+        # 先登记再发请求，确保订阅建立后的第一条事件不会丢失
+        req_id = next(self._ids)
+        watch = FlowWatch(self, req_id)
+        waiter: "queue.Queue[dict]" = queue.Queue(maxsize=1)
+        with self._lock:
+            self._watches[req_id] = watch
+            self._pending[req_id] = waiter
+        self.proc.stdin.write(json.dumps({"id": req_id, "op": "watch", "src": flow.client_ip,
+                                          "dst": flow.server_ip, "dport": flow.dport}) + "\n")
+        self.proc.stdin.flush()
+        try:
+            reply = waiter.get(timeout=self.timeout)
+        except queue.Empty:
+            reply = {"ok": False, "error": "timeout"}
+        if not reply.get("ok"):
+            with self._lock:
+                self._watches.pop(req_id, None)
+                self._pending.pop(req_id, None)
+            raise RuntimeError(f"conntrack agent error on watch: {reply.get('error')}")
+        return watch
+
+    def unwatch(self, watch: FlowWatch) -> None:
+        self.request("unwatch", watch=watch.watch_id)
+        with self._lock:
+            self._watches.pop(watch.watch_id, None)
+
+    def close(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.stdin.close()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
 
 
 class ConntrackEvaluator:
-    def __init__(self, nat_container: str, flow: FlowKey, out_dir: str = "./output/eval"):
+    def __init__(self, nat_container: str, flow: FlowKey, out_dir: str = "./output/eval",
+                 use_agent: bool = True):
         self.nat_container = nat_container
         self.flow = flow
         self.out_dir = out_dir
         os.makedirs(self.out_dir, exist_ok=True)
+        self.agent: Optional[ConntrackAgentClient] = None
+        if use_agent:
+            try:
+                self.agent = ConntrackAgentClient(nat_container)
+            except (OSError, RuntimeError) as e:
+                print(f"[!] conntrack agent unavailable, falling back to docker exec: {e}")
+
+    def close(self) -> None:
+        if self.agent is not None:
+            self.agent.close()
+            self.agent = None
 
     def _docker_exec(self, cmd: str) -> str:
         """Run a command inside nat_container and return stdout."""
@@ -53,8 +200,22 @@ class ConntrackEvaluator:
         return p.stdout
 
     def snapshot_conntrack(self) -> str:
+        """Full conntrack table."""
+        if self.agent is not None:
+            return "\n".join(self.agent.dump()) + "\n"
         return self._docker_exec("conntrack -L || true")
 
+    def snapshot_flow(self) -> str:
+        """Only the conntrack entries of the watched flow (filtered inside the NAT container)."""
+        if self.agent is not None:
+            rows = self.agent.query_flow(self.flow)
+            return "\n".join(rows) + "\n" if rows else ""
+        f = self.flow
+        return self._docker_exec(
+            f"conntrack -L -p tcp --orig-src {f.client_ip} --orig-dst {f.server_ip} "
+            f"--orig-port-dst {f.dport} 2>/dev/null || true"
+        )
+
     def extract_flow_state(self, conntrack_text: str) -> Optional[str]:
         """
         Try to find the TCP state for the flow:
@@ -76,6 +237,12 @@ class ConntrackEvaluator:
                         return tok
         return None
 
+    def watch_flow(self) -> FlowWatch:
+        """Subscribe to conntrack events of the watched flow (requires the agent)."""
+        if self.agent is None:
+            raise RuntimeError("event mode requires the conntrack agent")
+        return self.agent.watch(self.flow)
+
     def save_text(self, name: str, content: str) -> str:
         path = os.path.join(self.out_dir, name)
         with open(path, "w", encoding="utf-8") as f:
@@ -114,6 +281,197 @@ class ExperimentDriver:
         """
         return self._run(self.client_container, "python3 /scripts/client.py", timeout=120)
 
+    def ensure_load_server(self, port: int = 5100) -> None:
+        """在 server 容器后台启动 load_gen.py server（用于合法业务负载测量）"""
+        out = self._run(self.server_container, "pgrep -f '[l]oad_gen.py server' || true")
+        if not out.strip():
+            self._run(self.server_container,
+                      f"nohup python3 /scripts/load_gen.py server --port {port} "
+                      f">/logs/load_gen_server.log 2>&1 &", timeout=10)
+            time.sleep(1.0)
+
+    def run_load_client(self, server_ip: str, port: int = 5100, duration: float = 10.0,
+                        concurrency: int = 16, streams: int = 4) -> dict:
+        """在 client 容器运行一次 load_gen.py client，返回其 JSON 结果"""
+        cmd = (f"python3 /scripts/load_gen.py client --host {server_ip} --port {port} "
+               f"--duration {duration} --concurrency {concurrency} --streams {streams}")
+        out = self._run(self.client_container, cmd, timeout=int(duration * 3 + 60))
+        return json.loads(out.strip().splitlines()[-1])
+
+
+def parse_sport(row: str) -> Optional[int]:
+    """conntrack 条目（或事件行）中原始方向的源端口"""
+    m = SPORT_RE.search(row or "")
+    return int(m.group(1)) if m else None
+
+
+def wait_for_teardown(watch: FlowWatch, timeout: float, done: threading.Event,
+                      idle_grace: float = 0.5, preexisting: Optional[int] = None) -> List[dict]:
+    """
+    收集 flow 的状态迁移，直到出现终止迁移（CLOSE/TIME_WAIT/DESTROY）或超时。
+    client 流程结束后若 idle_grace 秒内没有新事件，也不再空等到超时。
+
+    watch 按 (src, dst, dport) 订阅，前几个 trial 残留的条目（TIME_WAIT 最长 120 秒）
+    也会产生 DESTROY 等事件。因此以本 trial 自己的 NEW / ESTABLISHED 事件固定 sport，
+    之后只接受该 sport 的事件；preexisting 为 trial 开始前已处于 ESTABLISHED 的条目的 sport。
+    """
+    transitions: List[dict] = []
+    sport: Optional[int] = None
+    deadline = time.time() + timeout
+    last_activity = time.time()
+    while time.time() < deadline:
+        try:
+            ev = watch.events.get(timeout=0.05)
+        except queue.Empty:
+            if done.is_set() and time.time() - last_activity > idle_grace:
+                break
+            continue
+        ev_sport = parse_sport(ev.get("raw"))
+        if sport is None:
+            if ev["type"] == "NEW" or ev["state"] == "ESTABLISHED" or (
+                    preexisting is not None and ev_sport == preexisting):
+                sport = ev_sport
+            else:
+                continue
+        if ev_sport != sport:
+            continue
+        last_activity = time.time()
+        transitions.append({"ts": ev["ts"], "type": ev["type"], "state": ev["state"], "sport": ev_sport})
+        if ev["type"] == "DESTROY" or ev["state"] in TEARDOWN_STATES or ev["state"] == "TIME_WAIT":
+            break
+    return transitions
+
+
+def run_trial(i: int, evaluator: ConntrackEvaluator, driver: "ExperimentDriver",
+              mode: str = "event", event_timeout: float = 10.0,
+              archive: Optional[EvidenceArchive] = None, environment: str = "") -> TrialResult:
+    """
+    执行一次 trial。event 模式按 conntrack 事件判定，snapshot 模式沿用前后快照比较。
+    给定 archive 时证据写入归档（before 去重 + after 增量），否则逐 trial 写文本文件。
+    """
+    if mode == "event" and evaluator.agent is None:
+        mode = "snapshot"
+
+    start = time.time()
+    before = evaluator.snapshot_flow()
+    state_before = evaluator.extract_flow_state(before)
+
+    watch = None
+    if mode == "event":
+        try:
+            # agent 在 conntrack -E 完成订阅后才应答，此后触发的流量不会漏事件
+            watch = evaluator.watch_flow()
+        except RuntimeError as e:
+            print(f"[!] trial {i}: event watch unavailable, using snapshots: {e}")
+            mode = "snapshot"
+
+    # 触发一次你现有的 client/server DoS 测试流程
+    notes = {"text": ""}
+    done = threading.Event()
+
+    def trigger() -> None:
+        try:
+            client_out = driver.trigger_client_dos_flow()
+            notes["text"] = f"client_out_len={len(client_out)}"
+        except Exception as e:
+            notes["text"] = f"client_trigger_error={e}"
+        finally:
+            done.set()
+
+    transitions: List[dict] = []
+    time_to_teardown = None
+    if watch is not None:
+        preexisting = None
+        if state_before == "ESTABLISHED":
+            preexisting = next((parse_sport(row) for row in before.splitlines() if "ESTABLISHED" in row), None)
+        worker = threading.Thread(target=trigger, daemon=True)
+        attack_start = time.time()
+        worker.start()
+        try:
+            transitions = wait_for_teardown(watch, event_timeout, done, preexisting=preexisting)
+        finally:
+            watch.stop()
+        worker.join()
+
+        # 判据：flow 建立后直接被拆除（CLOSE / DESTROY），而不是经 FIN 正常关闭
+        seen = [t["state"] for t in transitions if t["state"]]
+        established = state_before == "ESTABLISHED" or "ESTABLISHED" in seen
+        graceful = any(st in GRACEFUL_STATES for st in seen)
+        last = transitions[-1] if transitions else None
+        torn_down = last is not None and (last["type"] == "DESTROY" or last["state"] in TEARDOWN_STATES)
+        dos_observed = established and torn_down and not graceful
+        # 本 trial 内建立的 flow 从其 ESTABLISHED 事件起算，不含 docker exec 与 client.py 的启动时间；
+        # trial 开始前已处于 ESTABLISHED 的 flow（ReDAN 的常见情形）不会再有 NEW / ESTABLISHED 事件，
+        # 从触发攻击的时刻起算。conntrack 事件时间戳与宿主机 time.time() 取自同一内核时钟
+        established_ts = next((t["ts"] for t in transitions if t["state"] == "ESTABLISHED"), None)
+        if torn_down:
+            time_to_teardown = last["ts"] - (established_ts if established_ts is not None else attack_start)
+        after = evaluator.snapshot_flow()
+    else:
+        trigger()
+        # 给 NAT/conntrack 一点时间完成状态迁移
+        time.sleep(1.5)
+        after = evaluator.snapshot_flow()
+    state_after = evaluator.extract_flow_state(after)
+
+    if watch is None:
+        # 判据：同一条 flow 从 ESTABLISHED 变成 CLOSE（或直接消失）
+        dos_observed = (state_before == "ESTABLISHED" and (state_after == "CLOSE" or state_after is None))
+
+    end = time.time()
+
+    if archive is not None:
+        ref = os.path.basename(archive.path) + "#" + EvidenceArchive.ref(i, environment)
+        before_ref, after_ref = ref + ":before", ref + ":after"
+    else:
+        before_ref, after_ref = f"trial_{i:03d}_before.txt", f"trial_{i:03d}_after.txt"
+
+    result = TrialResult(
+        trial_id=i,
+        start_ts=start,
+        end_ts=end,
+        before_conntrack=before_ref,
+        after_conntrack=after_ref,
+        flow_state_before=state_before,
+        flow_state_after=state_after,
+        dos_observed=dos_observed,
+        notes=notes["text"],
+        mode=mode,
+        transitions=transitions,
+        time_to_teardown=time_to_teardown,
+        environment=environment,
+    )
+
+    # 保存证据
+    if archive is not None:
+        archive.put_trial(asdict(result), before, after, environment)
+    else:
+        evaluator.save_text(before_ref, before)
+        evaluator.save_text(after_ref, after)
+    return result
+
+
+def summarize(results: List[TrialResult], flow: Optional[FlowKey] = None,
+              include_results: bool = True) -> dict:
+    # run_stats 依赖 numpy，只在汇总时导入；执行 trial 的驱动侧仍只需标准库
+    from run_stats import distribution_summary, wilson_interval
+
+    trials = len(results)
+    success = sum(1 for r in results if r.dos_observed)
+    summary = {
+        "trials": trials,
+        "success": success,
+        "success_rate": (success / trials) if trials else 0.0,
+        "success_rate_ci95": list(wilson_interval(success, trials)),
+        "time_to_teardown": distribution_summary(
+            [r.time_to_teardown for r in results if r.time_to_teardown is not None]),
+    }
+    if flow is not None:
+        summary["flow"] = asdict(flow)
+    if include_results:
+        summary["results"] = [asdict(r) for r in results]
+    return summary
+
 
 def main():
     # 根据你的 compose 配置修改容器名
@@ -127,74 +485,41 @@ def main():
     OUT_DIR = "./output/eval"
     TRIALS = 20
     SLEEP_BETWEEN = 2.0
+    MODE = "event"  # event: 订阅 conntrack 事件；snapshot: 前后快照比较
+    EVENT_TIMEOUT = 10.0
 
     evaluator = ConntrackEvaluator(NAT_CONTAINER, FLOW, out_dir=OUT_DIR)
+    # 每次运行一个归档；逐 trial 的结果与证据都在其中
+    archive = EvidenceArchive(os.path.join(OUT_DIR, "evidence.sqlite"))
     driver = ExperimentDriver(CLIENT_CONTAINER, SERVER_CONTAINER)
 
     driver.ensure_server_running()
 
     results: List[TrialResult] = []
-    success = 0
 
     for i in range(1, TRIALS + 1):
-        start = time.time()
-        before = evaluator.snapshot_conntrack()
-        state_before = evaluator.extract_flow_state(before)
-
-        # 触发一次你现有的 client/server DoS 测试流程
-        notes = ""
-        try:
-            client_out = driver.trigger_client_dos_flow()
-            notes = f"client_out_len={len(client_out)}"
-        except Exception as e:
-            notes = f"client_trigger_error={e}"
-
-        # 给 NAT/conntrack 一点时间完成状态迁移
-        time.sleep(1.5)
+        r = run_trial(i, evaluator, driver, mode=MODE, event_timeout=EVENT_TIMEOUT, archive=archive)
+        results.append(r)
 
-        after = evaluator.snapshot_conntrack()
-        state_after = evaluator.extract_flow_state(after)
-
-        # 判据：同一条 flow 从 ESTABLISHED 变成 CLOSE（或直接消失）
-        dos_observed = (state_before == "ESTABLISHED" and (state_after == "CLOSE" or state_after is None))
-        if dos_observed:
-            success += 1
-
-        end = time.time()
-
-        # 保存证据
-        evaluator.save_text(f"trial_{i:03d}_before.txt", before)
-        evaluator.save_text(f"trial_{i:03d}_after.txt", after)
-
-        results.append(TrialResult(
-            trial_id=i,
-            start_ts=start,
-            end_ts=end,
-            before_conntrack=f"trial_{i:03d}_before.txt",
-            after_conntrack=f"trial_{i:03d}_after.txt",
-            flow_state_before=state_before,
-            flow_state_after=state_after,
-            dos_observed=dos_observed,
-            notes=notes
-        ))
-
-        print(f"[trial {i:03d}] before={state_before} after={state_after} dos_observed={dos_observed}")
+        ttt = f" time_to_teardown={r.time_to_teardown:.3f}s" if r.time_to_teardown is not None else ""
+        print(f"[trial {i:03d}] before={r.flow_state_before} after={r.flow_state_after} "
+              f"dos_observed={r.dos_observed}{ttt}")
         time.sleep(SLEEP_BETWEEN)
 
-    summary = {
-        "trials": TRIALS,
-        "success": success,
-        "success_rate": (success / TRIALS) if TRIALS else 0.0,
-        "flow": asdict(FLOW),
-        "results": [asdict(r) for r in results],
-    }
+    evaluator.close()
+
+    summary = summarize(results, FLOW, include_results=False)
+    summary["evidence_archive"] = os.path.basename(archive.path)
+    archive.close()
 
     os.makedirs(OUT_DIR, exist_ok=True)
     with open(os.path.join(OUT_DIR, "summary.json"), "w", encoding="utf-8") as f:
         json.dump(summary, f, indent=2)
 
-    print(f"\n[+] Done. success={success}/{TRIALS} rate={summary['success_rate']:.3f}")
-    print(f"[+] Evidence written under {OUT_DIR}/ (summary.json + per-trial conntrack snapshots)")
+    low, high = summary["success_rate_ci95"]
+    print(f"\n[+] Done. success={summary['success']}/{TRIALS} rate={summary['success_rate']:.3f} "
+          f"(95% CI {low:.3f}-{high:.3f})")
+    print(f"[+] Evidence written under {OUT_DIR}/ (summary.json + evidence.sqlite)")
 
 
 if __name__ == "__main__":
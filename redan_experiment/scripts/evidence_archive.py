@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+评估证据归档
+每次运行一个 SQLite 文件，替代逐 trial 的 conntrack 文本文件:
+- before 快照按内容哈希去重后压缩保存（大量 trial 的 before 几乎相同）
+- after 只保存相对 before 的增删行（压缩）
+- 每个 TrialResult 以 JSON 形式保存在同一行，按 (environment, trial_id) 主键随机访问
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trials (
+    environment TEXT NOT NULL,
+    trial_id INTEGER NOT NULL,
+    before_hash TEXT NOT NULL REFERENCES snapshots(hash),
+    removed BLOB NOT NULL,
+    added BLOB NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (environment, trial_id)
+);
+"""
+
+
+def _pack(rows: List[str]) -> bytes:
+    return zlib.compress("\n".join(rows).encode("utf-8"))
+
+
+def _unpack(blob: bytes) -> List[str]:
+    text = zlib.decompress(blob).decode("utf-8")
+    return text.split("\n") if text else []
+
+
+def _rows(text: str) -> List[str]:
+    return [line for line in text.splitlines() if line.strip()]
+
+
+def diff_rows(before: List[str], after: List[str]) -> Tuple[List[str], List[str]]:
+    """按多重集合比较，返回 (被删除的行, 新增的行)"""
+    b, a = Counter(before), Counter(after)
+    removed = list((b - a).elements())
+    added = list((a - b).elements())
+    return removed, added
+
+
+def apply_delta(before: List[str], removed: List[str], added: List[str]) -> List[str]:
+    drop = Counter(removed)
+    kept = []
+    for row in before:
+        if drop[row]:
+            drop[row] -= 1
+        else:
+            kept.append(row)
+    return kept + added
+
+
+class EvidenceArchive:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def put_trial(self, result: dict, before: str, after: str, environment: str = "") -> str:
+        """保存一次 trial 的证据与结果，返回可写入 TrialResult 的引用字符串"""
+        before_rows, after_rows = _rows(before), _rows(after)
+        removed, added = diff_rows(before_rows, after_rows)
+        before_blob = "\n".join(before_rows).encode("utf-8")
+        before_hash = hashlib.sha1(before_blob).hexdigest()
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO snapshots (hash, data) VALUES (?, ?)",
+                              (before_hash, zlib.compress(before_blob)))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO trials (environment, trial_id, before_hash, removed, added, result) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (environment, result["trial_id"], before_hash, _pack(removed), _pack(added),
+                 json.dumps(result)),
+            )
+        return self.ref(result["trial_id"], environment)
+
+    @staticmethod
+    def ref(trial_id: int, environment: str = "") -> str:
+        return f"{environment}/{trial_id}" if environment else str(trial_id)
+
+    def get_evidence(self, trial_id: int, environment: str = "") -> Optional[Tuple[str, str]]:
+        """按主键取回一次 trial 的 (before, after) conntrack 文本"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT s.data, t.removed, t.added FROM trials t JOIN snapshots s ON s.hash = t.before_hash "
+                "WHERE t.environment = ? AND t.trial_id = ?", (environment, trial_id)).fetchone()
+        if row is None:
+            return None
+        before = _unpack(row[0])
+        after = apply_delta(before, _unpack(row[1]), _unpack(row[2]))
+        return "\n".join(before) + "\n" if before else "", "\n".join(after) + "\n" if after else ""
+
+    def get_result(self, trial_id: int, environment: str = "") -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute("SELECT result FROM trials WHERE environment = ? AND trial_id = ?",
+                                    (environment, trial_id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_results(self) -> Iterator[dict]:
+        with self._lock:
+            rows = self.conn.execute("SELECT result FROM trials ORDER BY environment, trial_id").fetchall()
+        for (result,) in rows:
+            yield json.loads(result)
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+经 NAT 的合法业务负载生成器（asyncio）
+server 端运行在 server 容器，client 端运行在 client 容器，流量全部经过 nat_device。
+每个连接先发送一行模式名:
+  PING  服务器回复 "OK" 后关闭 —— 测量新建连接速率（每个连接都会新建一条 conntrack 映射）
+  ECHO  持续回显 64 字节消息 —— 测量长连接上的请求往返时延
+  SINK  持续接收直到客户端半关闭，回复收到的字节数 —— 测量吞吐
+
+用法:
+    python3 /scripts/load_gen.py server --port 5100
+    python3 /scripts/load_gen.py client --host 10.0.0.10 --port 5100 --duration 10
+client 端把结果以一个 JSON 对象输出到 stdout。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+MESSAGE_SIZE = 64
+CHUNK = b'\0' * 65536
+
+
+async def handle(reader, writer):
+    try:
+        mode = (await reader.readline()).strip()
+        if mode == b'PING':
+            writer.write(b'OK\n')
+            await writer.drain()
+        elif mode == b'ECHO':
+            while True:
+                data = await reader.readexactly(MESSAGE_SIZE)
+                writer.write(data)
+                await writer.drain()
+        elif mode == b'SINK':
+            total = 0
+            while True:
+                data = await reader.read(1 << 20)
+                if not data:
+                    break
+                total += len(data)
+            writer.write(f"{total}\n".encode())
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(port):
+    server = await asyncio.start_server(handle, '0.0.0.0', port, backlog=1024)
+    print(f"[*] load_gen server 监听 0.0.0.0:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def latency_summary(samples_ms):
+    samples_ms = sorted(samples_ms)
+    return {
+        'count': len(samples_ms),
+        'mean_ms': sum(samples_ms) / len(samples_ms) if samples_ms else None,
+        'p50_ms': percentile(samples_ms, 0.50),
+        'p99_ms': percentile(samples_ms, 0.99),
+        'max_ms': samples_ms[-1] if samples_ms else None,
+    }
+
+
+async def connection_rate(host, port, duration, concurrency, timeout):
+    """每个 worker 循环执行 建连 -> PING -> 关闭"""
+    deadline = time.monotonic() + duration
+    latencies = []
+    errors = {'timeout': 0, 'error': 0}
+
+    async def worker():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+                writer.write(b'PING\n')
+                await asyncio.wait_for(reader.readline(), timeout)
+                writer.close()
+                latencies.append((time.perf_counter() - start) * 1000)
+            except asyncio.TimeoutError:
+                errors['timeout'] += 1
+            except OSError:
+                errors['error'] += 1
+                await asyncio.sleep(0.01)
+
+    start = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.monotonic() - start
+    result = {'connections_per_second': len(latencies) / elapsed, 'errors': errors}
+    result.update(latency_summary(latencies))
+    return result
+
+
+async def throughput(host, port, duration, streams, timeout):
+    """并发 streams 条连接持续发送，服务器确认收到的字节数"""
+    deadline = time.monotonic() + duration
+
+    async def stream():
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.write(b'SINK\n')
+        while time.monotonic() < deadline:
+            writer.write(CHUNK)
+            await writer.drain()
+        writer.write_eof()
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        writer.close()
+        return int(line or 0)
+
+    start = time.monotonic()
+    received = await asyncio.gather(*(stream() for _ in range(streams)), return_exceptions=True)
+    elapsed = time.monotonic() - start
+    total = sum(r for r in received if isinstance(r, int))
+    return {
+        'mbit_per_second': total * 8 / elapsed / 1e6,
+        'bytes': total,
+        'streams_failed': sum(1 for r in received if not isinstance(r, int)),
+    }
+
+
+async def request_latency(host, port, duration, concurrency, timeout):
+    """长连接上的 64 字节请求/回显往返时延"""
+    deadline = time.monotonic() + duration
+    latencies = []
+    errors = {'timeout': 0, 'error': 0}
+    message = b'x' * MESSAGE_SIZE
+
+    async def worker():
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        except (asyncio.TimeoutError, OSError):
+            errors['error'] += 1
+            return
+        writer.write(b'ECHO\n')
+        try:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                writer.write(message)
+                await asyncio.wait_for(reader.readexactly(MESSAGE_SIZE), timeout)
+                latencies.append((time.perf_counter() - start) * 1000)
+        except asyncio.TimeoutError:
+            errors['timeout'] += 1
+        except (asyncio.IncompleteReadError, OSError):
+            errors['error'] += 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = latency_summary(latencies)
+    result['errors'] = errors
+    return result
+
+
+async def run_client(args):
+    result = {'host': args.host, 'port': args.port, 'duration': args.duration}
+    result['connection_rate'] = await connection_rate(args.host, args.port, args.duration,
+                                                      args.concurrency, args.timeout)
+    result['throughput'] = await throughput(args.host, args.port, args.duration, args.streams, args.timeout)
+    result['latency'] = await request_latency(args.host, args.port, args.duration,
+                                              args.concurrency, args.timeout)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Legitimate client/server load through the NAT")
+    sub = parser.add_subparsers(dest='role')
+    sub.required = True
+    srv = sub.add_parser('server')
+    srv.add_argument('--port', type=int, default=5100)
+    cli = sub.add_parser('client')
+    cli.add_argument('--host', default=os.environ.get('SERVER_IP', '10.0.0.10'))
+    cli.add_argument('--port', type=int, default=5100)
+    cli.add_argument('--duration', type=float, default=10.0, help='seconds per measurement')
+    cli.add_argument('--concurrency', type=int, default=16)
+    cli.add_argument('--streams', type=int, default=4)
+    cli.add_argument('--timeout', type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    if args.role == 'server':
+        try:
+            asyncio.run(serve(args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(asyncio.run(run_client(args))))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,35 +7,208 @@
 import psutil
 import time
 import json
+import math
 import os
 import threading
 from datetime import datetime
 
+import sock_diag
+from metrics_store import MetricsStoreWriter, RunningStats, corrected_cpu, fill_forward, thin_sample
+
+# 自适应模式的最高节流级别: 1~3 级慢速层间隔依次翻倍，4 级再跳过进程列表
+MAX_THROTTLE = 4
+
+def _lap(probe_ms, name, tick):
+    """记录自 tick 起的耗时（毫秒），返回新的起点"""
+    now = time.perf_counter()
+    probe_ms[name] = round((now - tick) * 1000, 3)
+    return now
+
 class MetricsCollector:
-    def __init__(self, output_file, interval=5):
+    def __init__(self, output_file, interval=0.1, store_file=None, batch_size=64,
+                 slow_interval=5, display_interval=1, connection_backend='auto',
+                 overhead_budget=None, jsonl_interval=None):
         self.output_file = output_file
+        self.store_file = store_file
+        # 列式存储保存全分辨率数据，此时 JSONL 每 jsonl_interval 秒只写一行（默认1秒）
+        if jsonl_interval is None:
+            jsonl_interval = 1.0 if store_file else 0.0
+        self.jsonl_interval = jsonl_interval
+        self._next_jsonl = 0.0
+        self._jsonl_written = {}
+        # 快速层（CPU/内存/网络计数器）与慢速层（连接表/进程列表）分别调度
         self.interval = interval
+        self.slow_interval = slow_interval
+        self.display_interval = display_interval
+        self.batch_size = batch_size
+        # 连接统计后端: auto 依次尝试 netlink -> proc -> psutil
+        if connection_backend == 'auto':
+            self._connection_backends = ['netlink', 'proc', 'psutil']
+        else:
+            self._connection_backends = [connection_backend]
         self.running = False
-        self.collected_data = []
+        self._slow_lock = threading.Lock()
+        self._slow_thread = None
+        self._connections = {'total': 0, 'established': 0, 'listen': 0,
+                             'time_wait': 0, 'close_wait': 0, 'other': 0}
+        self._connections_ts = None
+        self._processes = []
+        self._processes_ts = None
+        # 自身开销: 各探针耗时（毫秒）与进程CPU时间（含慢速层线程）
+        self._cpu_count = psutil.cpu_count() or 1
+        self._slow_probe_ms = {'connections': None, 'processes': None}
+        self._last_cpu_time = None
+        self._last_wall = None
+        # 自适应节流: overhead_budget 为采集器可占用的单核CPU百分比，None 表示不节流
+        self.overhead_budget = overhead_budget
+        self.throttle = 0
+        self._budget_cpu_time = None
+        self._budget_wall = None
+        # 只保留首尾样本与增量统计，内存占用不随采集时长增长
+        self.sample_count = 0
+        self.first_sample = None
+        self.last_sample = None
+        self.cpu_stats = RunningStats()
+        self.memory_stats = RunningStats()
+        self.connection_stats = RunningStats()
+        self.collector_cpu_stats = RunningStats()
+        self.fast_probe_stats = RunningStats()
+        self.slow_probe_stats = {name: RunningStats() for name in self._slow_probe_ms}
+        self.distorted_samples = 0
+        self.throttled_samples = 0
+        self._jsonl = None
+        self._store = None
         
     def collect_system_metrics(self):
-        """收集系统性能指标"""
+        """收集系统性能指标（快速层，非阻塞），附带采集器自身的开销"""
+        now = time.time()
+        probe_ms = {}
+        start = tick = time.perf_counter()
+        # interval=None 返回自上次调用以来的增量，不会阻塞
+        cpu_percent = psutil.cpu_percent(interval=None)
+        tick = _lap(probe_ms, 'cpu', tick)
+        memory = psutil.virtual_memory()
+        tick = _lap(probe_ms, 'memory', tick)
+        disk_io = psutil.disk_io_counters()
+        tick = _lap(probe_ms, 'disk_io', tick)
+        network_io = psutil.net_io_counters()
+        tick = _lap(probe_ms, 'network_io', tick)
+        fast_ms = round((tick - start) * 1000, 3)
+        
+        # 慢速层的结果带各自的采样时间戳，探针耗时为最近一次慢速采样的值
+        with self._slow_lock:
+            connections = dict(self._connections)
+            connections_ts = self._connections_ts
+            processes = self._processes
+            processes_ts = self._processes_ts
+            probe_ms.update(self._slow_probe_ms)
+        
         metrics = {
-            'timestamp': time.time(),
-            'datetime': datetime.now().isoformat(),
-            'cpu_percent': psutil.cpu_percent(interval=1),
-            'memory_percent': psutil.virtual_memory().percent,
-            'memory_mb': psutil.virtual_memory().used / (1024 * 1024),
-            'disk_io': psutil.disk_io_counters()._asdict() if psutil.disk_io_counters() else {},
-            'network_io': psutil.net_io_counters()._asdict(),
-            'connections': self.get_network_connections(),
-            'processes': self.get_process_info(),
-            'load_average': os.getloadavg() if hasattr(os, 'getloadavg') else [0, 0, 0]
+            'timestamp': now,
+            'datetime': datetime.fromtimestamp(now).isoformat(),
+            'cpu_percent': cpu_percent,
+            'memory_percent': memory.percent,
+            'memory_mb': memory.used / (1024 * 1024),
+            'disk_io': disk_io._asdict() if disk_io else {},
+            'network_io': network_io._asdict(),
+            'connections': connections,
+            'connections_timestamp': connections_ts,
+            'processes': processes,
+            'processes_timestamp': processes_ts,
+            'load_average': os.getloadavg() if hasattr(os, 'getloadavg') else [0, 0, 0],
+            'collector': self._self_overhead(fast_ms, probe_ms)
         }
         return metrics
     
+    def _self_overhead(self, fast_ms, probe_ms):
+        """
+        自上一个样本以来采集器进程消耗的CPU时间（含慢速层线程与写盘）。
+        cpu_percent 为占整机CPU的百分点，与 psutil.cpu_percent 口径一致，可直接相减；
+        core_percent 为占单核的百分比。首个样本没有参照，两者为 None。
+        """
+        cpu_time, wall = time.process_time(), time.monotonic()
+        cpu_share = core_share = None
+        if self._last_cpu_time is not None and wall > self._last_wall:
+            core_share = round((cpu_time - self._last_cpu_time) / (wall - self._last_wall) * 100, 3)
+            cpu_share = round(core_share / self._cpu_count, 3)
+        self._last_cpu_time, self._last_wall = cpu_time, wall
+        return {
+            'cpu_percent': cpu_share,
+            'core_percent': core_share,
+            'fast_ms': fast_ms,
+            'probe_ms': probe_ms,
+            'throttle': self.throttle
+        }
+    
+    def collect_slow_metrics(self, skip_processes=False):
+        """慢速层：遍历连接表与进程列表，结果写入缓存；skip_processes 时沿用上一次的进程列表"""
+        tick = time.perf_counter()
+        connections = self.get_network_connections()
+        connections_ts = time.time()
+        probe_ms = {'connections': None, 'processes': None}
+        tick = _lap(probe_ms, 'connections', tick)
+        if not skip_processes:
+            processes = self.get_process_info()
+            processes_ts = time.time()
+            _lap(probe_ms, 'processes', tick)
+        
+        with self._slow_lock:
+            self._connections = connections
+            self._connections_ts = connections_ts
+            self._slow_probe_ms = probe_ms
+            if not skip_processes:
+                self._processes = processes
+                self._processes_ts = processes_ts
+        for name, ms in probe_ms.items():
+            self.slow_probe_stats[name].update(ms)
+    
+    def _adapt_throttle(self):
+        """
+        按上一个慢速周期内采集器占用的单核CPU百分比调整节流级别:
+        超出预算升一级，低于预算一半降一级。
+        """
+        cpu_time, wall = time.process_time(), time.monotonic()
+        if self._budget_wall is not None and wall > self._budget_wall:
+            usage = (cpu_time - self._budget_cpu_time) / (wall - self._budget_wall) * 100
+            if usage > self.overhead_budget and self.throttle < MAX_THROTTLE:
+                self.throttle += 1
+                print(f"[!] 采集器自身占用 {usage:.1f}% CPU，超出预算 {self.overhead_budget}%，"
+                      f"节流级别升至 {self.throttle}")
+            elif usage < self.overhead_budget / 2 and self.throttle > 0:
+                self.throttle -= 1
+                print(f"[*] 采集器自身占用 {usage:.1f}% CPU，节流级别降至 {self.throttle}")
+        self._budget_cpu_time, self._budget_wall = cpu_time, wall
+    
+    def _slow_loop(self):
+        """慢速层采样线程"""
+        next_run = time.monotonic()
+        while self.running:
+            try:
+                self.collect_slow_metrics(skip_processes=self.throttle >= MAX_THROTTLE)
+            except Exception as e:
+                print(f"[!] 收集连接/进程信息时出错: {e}")
+            if self.overhead_budget is not None:
+                self._adapt_throttle()
+            # 节流时慢速层间隔按级别翻倍（最多 8 倍）
+            next_run += self.slow_interval * 2 ** min(self.throttle, MAX_THROTTLE - 1)
+            time.sleep(max(0.0, next_run - time.monotonic()))
+    
     def get_network_connections(self):
-        """获取网络连接信息"""
+        """获取网络连接信息，优先从内核批量读取各状态计数"""
+        for backend in list(self._connection_backends):
+            if backend == 'psutil':
+                return self.get_network_connections_psutil()
+            try:
+                return sock_diag.count_connection_states(backend)
+            except OSError as e:
+                if len(self._connection_backends) == 1:
+                    raise
+                # 记住不可用的后端，后续采样不再尝试
+                print(f"[!] 连接统计后端 {backend} 不可用，切换下一个: {e}")
+                self._connection_backends.remove(backend)
+    
+    def get_network_connections_psutil(self):
+        """通过psutil逐个遍历套接字获取网络连接信息（回退路径）"""
         connections = psutil.net_connections()
         connection_summary = {
             'total': len(connections),
@@ -76,38 +249,101 @@ class MetricsCollector:
     def start_collection(self):
         """开始收集指标"""
         print(f"[*] 开始收集性能指标，输出到 {self.output_file}")
-        print(f"[*] 收集间隔: {self.interval}秒")
+        print(f"[*] 收集间隔: {self.interval}秒 (连接/进程: {self.slow_interval}秒)")
         
         self.running = True
+        self.open_outputs()
         
-        # 确保输出目录存在
-        os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
+        # 建立CPU增量基准，并先完成一次慢速采样
+        psutil.cpu_percent(interval=None)
+        self.collect_slow_metrics()
+        self._slow_thread = threading.Thread(target=self._slow_loop, daemon=True)
+        self._slow_thread.start()
         
-        while self.running:
-            try:
-                metrics = self.collect_system_metrics()
-                self.collected_data.append(metrics)
-                
-                # 实时写入文件
-                with open(self.output_file, 'a') as f:
-                    f.write(json.dumps(metrics) + '\n')
-                
-                # 显示当前状态
-                self.display_current_status(metrics)
-                
-                time.sleep(self.interval)
+        # 按绝对截止时间调度，避免采样耗时造成时间漂移
+        next_tick = time.monotonic() + self.interval
+        next_display = 0.0
+        try:
+            while self.running:
+                try:
+                    metrics = self.collect_system_metrics()
+                    self.record_sample(metrics)
+                    
+                    # 显示当前状态（限频）
+                    if time.monotonic() >= next_display:
+                        self.display_current_status(metrics)
+                        next_display = time.monotonic() + self.display_interval
+                    
+                except Exception as e:
+                    print(f"[!] 收集指标时出错: {e}")
                 
-            except Exception as e:
-                print(f"[!] 收集指标时出错: {e}")
-                time.sleep(self.interval)
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                    next_tick += self.interval
+                else:
+                    # 落后太多时跳过错过的采样点
+                    next_tick = time.monotonic() + self.interval
+        finally:
+            self.running = False
+            self.close_outputs()
+    
+    def open_outputs(self):
+        """打开输出文件，采集期间句柄常驻"""
+        # 确保输出目录存在
+        os.makedirs(os.path.dirname(self.output_file) or '.', exist_ok=True)
+        self._jsonl = open(self.output_file, 'a', buffering=1024 * 1024)
+        if self.store_file:
+            self._store = MetricsStoreWriter(self.store_file, batch_size=self.batch_size)
+            if self._store.rotated:
+                print(f"[!] {self.store_file} 的列与当前版本不一致，已改名为 {self._store.rotated}")
+    
+    def close_outputs(self):
+        """刷盘并关闭输出文件"""
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+    
+    def record_sample(self, metrics):
+        """写入一条样本并更新增量统计"""
+        # JSONL 中未刷新的慢速层字段（连接表 / 进程列表）省略，读取时由 fill_forward 补齐
+        if self._jsonl is not None and metrics['timestamp'] >= self._next_jsonl:
+            self._jsonl.write(json.dumps(thin_sample(metrics, self._jsonl_written)) + '\n')
+            if self.jsonl_interval > 0:
+                self._next_jsonl = (metrics['timestamp'] // self.jsonl_interval + 1) * self.jsonl_interval
+        if self._store is not None:
+            self._store.append(metrics)
+        
+        self.sample_count += 1
+        if self.sample_count % self.batch_size == 0 and self._jsonl is not None:
+            self._jsonl.flush()
+        
+        if self.first_sample is None:
+            self.first_sample = metrics
+        self.last_sample = metrics
+        self.cpu_stats.update(metrics['cpu_percent'])
+        self.memory_stats.update(metrics['memory_percent'])
+        self.connection_stats.update(metrics['connections']['total'])
+        
+        collector = metrics.get('collector')
+        if collector is not None:
+            self.collector_cpu_stats.update(collector['cpu_percent'])
+            self.fast_probe_stats.update(collector['fast_ms'])
+            self.throttled_samples += collector['throttle'] > 0
+            self.distorted_samples += corrected_cpu(metrics['cpu_percent'], collector['cpu_percent'])[1]
     
     def display_current_status(self, metrics):
         """显示当前系统状态"""
+        overhead = metrics.get('collector', {}).get('core_percent')
         print(f"[{datetime.now().strftime('%H:%M:%S')}] "
               f"CPU: {metrics['cpu_percent']:5.1f}% | "
               f"内存: {metrics['memory_percent']:5.1f}% | "
               f"连接: {metrics['connections']['total']:3d} | "
-              f"网络: {metrics['network_io']['bytes_sent']//1024:8d}KB sent")
+              f"网络: {metrics['network_io']['bytes_sent']//1024:8d}KB sent"
+              + (f" | 采集器: {overhead:4.1f}%" if overhead is not None else ""))
     
     def stop_collection(self):
         """停止收集指标"""
@@ -116,31 +352,31 @@ class MetricsCollector:
     
     def generate_summary(self):
         """生成数据摘要"""
-        if not self.collected_data:
+        if not self.sample_count:
             return {}
         
-        df = self.collected_data
+        first, last = self.first_sample, self.last_sample
         
         summary = {
             'collection_period': {
-                'start': df[0]['datetime'],
-                'end': df[-1]['datetime'],
-                'duration_minutes': (df[-1]['timestamp'] - df[0]['timestamp']) / 60
-            },
-            'cpu_stats': {
-                'average': sum(d['cpu_percent'] for d in df) / len(df),
-                'maximum': max(d['cpu_percent'] for d in df),
-                'minimum': min(d['cpu_percent'] for d in df)
-            },
-            'memory_stats': {
-                'average': sum(d['memory_percent'] for d in df) / len(df),
-                'maximum': max(d['memory_percent'] for d in df),
-                'minimum': min(d['memory_percent'] for d in df)
+                'start': first['datetime'],
+                'end': last['datetime'],
+                'duration_minutes': (last['timestamp'] - first['timestamp']) / 60
             },
+            'cpu_stats': self.cpu_stats.as_dict(),
+            'memory_stats': self.memory_stats.as_dict(),
             'network_stats': {
-                'total_bytes_sent': df[-1]['network_io']['bytes_sent'] - df[0]['network_io']['bytes_sent'],
-                'total_bytes_recv': df[-1]['network_io']['bytes_recv'] - df[0]['network_io']['bytes_recv'],
-                'peak_connections': max(d['connections']['total'] for d in df)
+                'total_bytes_sent': last['network_io']['bytes_sent'] - first['network_io']['bytes_sent'],
+                'total_bytes_recv': last['network_io']['bytes_recv'] - first['network_io']['bytes_recv'],
+                'peak_connections': self.connection_stats.maximum
+            },
+            'collector_overhead': {
+                'cpu_stats': self.collector_cpu_stats.as_dict(),
+                'fast_probe_ms': self.fast_probe_stats.as_dict(),
+                'slow_probe_ms': {name: stats.as_dict() for name, stats in self.slow_probe_stats.items()},
+                'distorted_samples': self.distorted_samples,
+                'throttled_samples': self.throttled_samples,
+                'overhead_budget': self.overhead_budget
             }
         }
         
@@ -154,9 +390,7 @@ class AttackEffectAnalyzer:
     def load_data(self):
         """加载指标数据"""
         with open(self.metrics_file, 'r') as f:
-            for line in f:
-                if line.strip():
-                    self.data.append(json.loads(line))
+            self.data = list(fill_forward(json.loads(line) for line in f if line.strip()))
     
     def analyze_attack_effect(self):
         """分析攻击效果"""
@@ -164,12 +398,25 @@ class AttackEffectAnalyzer:
             print("[-] 没有数据可供分析")
             return
         
-        # 寻找异常模式
+        # 寻找异常模式；CPU 扣除采集器自身的开销，并统计被采集器扭曲的样本
         connections = [d['connections']['total'] for d in self.data]
-        cpu_usage = [d['cpu_percent'] for d in self.data]
+        corrected = [corrected_cpu(d['cpu_percent'], d.get('collector', {}).get('cpu_percent'))
+                     for d in self.data]
+        cpu_usage = [cpu for cpu, _ in corrected]
+        distorted = sum(flag for _, flag in corrected)
         
-        # 检测连接数下降
-        baseline_connections = sum(connections[:10]) / 10  # 前10个值的平均值
+        # 检测连接数下降：以显著下降点之前的全部样本作为基线（按连接表刷新时间去重）
+        # run_stats 依赖numpy，采集容器中不一定安装，因此在这里延迟导入
+        from run_stats import detect_drop
+        timestamps = [d['timestamp'] for d in self.data]
+        refresh = [d.get('connections_timestamp') for d in self.data]
+        drop = detect_drop(connections, timestamps,
+                           refresh_timestamps=[math.nan if r is None else r for r in refresh])
+        if drop is not None:
+            baseline_connections = drop['baseline']
+        else:
+            head = connections[:10]
+            baseline_connections = sum(head) / len(head)  # 无变点时退回前10个值的平均值
         min_connections = min(connections)
         connection_drop = baseline_connections - min_connections
         
@@ -186,7 +433,12 @@ class AttackEffectAnalyzer:
             'max_cpu_usage': max_cpu,
             'average_cpu_usage': avg_cpu,
             'cpu_spike': cpu_spike,
-            'attack_detected': connection_drop > baseline_connections * 0.3  # 连接数下降超过30%
+            'collector_distorted_samples': distorted,
+            'collector_distorted_percent': distorted / len(self.data) * 100,
+            'attack_detected': connection_drop > baseline_connections * 0.3,  # 连接数下降超过30%
+            'change_points': drop['change_points'] if drop else [],
+            'effect_onset': drop['onset_ts'] if drop else None,
+            'time_to_effect': drop['time_to_effect'] if drop else None
         }
         
         return analysis
@@ -195,14 +447,16 @@ class AttackEffectAnalyzer:
         """生成时间线分析"""
         timeline = []
         
-        for i, entry in enumerate(self.data):
+        start = self.data[0]['timestamp'] if self.data else 0
+        for entry in self.data:
             timeline.append({
-                'time': i * 5,  # 假设每5秒一个数据点
+                'time': entry['timestamp'] - start,  # 相对采集开始的秒数
                 'connections': entry['connections']['total'],
                 'cpu': entry['cpu_percent'],
                 'memory': entry['memory_percent'],
                 'network_sent': entry['network_io']['bytes_sent'],
-                'network_recv': entry['network_io']['bytes_recv']
+                'network_recv': entry['network_io']['bytes_recv'],
+                'collector_cpu': entry.get('collector', {}).get('cpu_percent')
             })
         
         return timeline
@@ -210,9 +464,13 @@ class AttackEffectAnalyzer:
 def main():
     # 启动指标收集
     output_file = '/output/system_metrics.jsonl'
-    interval = 5  # 5秒间隔
+    store_file = '/output/system_metrics.bin'
+    interval = 0.1  # 快速层100毫秒间隔
+    slow_interval = 5  # 连接表/进程列表5秒间隔
+    overhead_budget = 5.0  # 采集器自身最多占用单核5%的CPU，超出时对慢速层退避
     
-    collector = MetricsCollector(output_file, interval)
+    collector = MetricsCollector(output_file, interval, store_file=store_file,
+                                 slow_interval=slow_interval, overhead_budget=overhead_budget)
     
     try:
         collector.start_collection()
@@ -227,7 +485,7 @@ def main():
             json.dump(summary, f, indent=2)
         
         print("[*] 数据摘要已保存")
-        print(f"[*] 共收集 {len(collector.collected_data)} 个数据点")
+        print(f"[*] 共收集 {collector.sample_count} 个数据点")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
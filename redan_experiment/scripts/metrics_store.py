@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+指标列式存储
+以固定schema的二进制追加文件保存系统指标，文件句柄常驻、批量刷盘，
+内存占用与采集时长无关；同时提供增量统计，供摘要直接使用。
+
+文件格式:
+    magic(4B) | header_len(uint32 LE) | header(JSON: columns/version)
+    之后为定长记录，每条记录为 len(columns) 个 float64 (LE)
+列集合每变化一次 VERSION 加一；读取按列名进行，旧版本文件仍可读取。
+"""
+
+import json
+import math
+import os
+import struct
+import time
+from array import array
+
+MAGIC = b'RDMS'
+# 1: 初始列; 2: 连接状态细分与慢速层时间戳; 3: 采集器自身开销
+VERSION = 3
+
+# 列名与嵌套字典中的路径一一对应，列名与 pd.json_normalize 的展开结果一致
+COLUMNS = [
+    ('timestamp', ('timestamp',)),
+    ('cpu_percent', ('cpu_percent',)),
+    ('memory_percent', ('memory_percent',)),
+    ('memory_mb', ('memory_mb',)),
+    ('load_average.1', ('load_average', 0)),
+    ('load_average.5', ('load_average', 1)),
+    ('load_average.15', ('load_average', 2)),
+    ('network_io.bytes_sent', ('network_io', 'bytes_sent')),
+    ('network_io.bytes_recv', ('network_io', 'bytes_recv')),
+    ('network_io.packets_sent', ('network_io', 'packets_sent')),
+    ('network_io.packets_recv', ('network_io', 'packets_recv')),
+    ('network_io.errin', ('network_io', 'errin')),
+    ('network_io.errout', ('network_io', 'errout')),
+    ('network_io.dropin', ('network_io', 'dropin')),
+    ('network_io.dropout', ('network_io', 'dropout')),
+    ('disk_io.read_bytes', ('disk_io', 'read_bytes')),
+    ('disk_io.write_bytes', ('disk_io', 'write_bytes')),
+    ('connections.total', ('connections', 'total')),
+    ('connections.established', ('connections', 'established')),
+    ('connections.listen', ('connections', 'listen')),
+    ('connections.time_wait', ('connections', 'time_wait')),
+    ('connections.close_wait', ('connections', 'close_wait')),
+    ('connections.other', ('connections', 'other')),
+    ('connections_timestamp', ('connections_timestamp',)),
+    ('processes_timestamp', ('processes_timestamp',)),
+    # 采集器自身开销（旧文件中没有这些列）
+    ('collector.cpu_percent', ('collector', 'cpu_percent')),
+    ('collector.core_percent', ('collector', 'core_percent')),
+    ('collector.fast_ms', ('collector', 'fast_ms')),
+    ('collector.probe_ms.connections', ('collector', 'probe_ms', 'connections')),
+    ('collector.probe_ms.processes', ('collector', 'probe_ms', 'processes')),
+    ('collector.throttle', ('collector', 'throttle')),
+]
+
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+# 慢速层字段及其刷新时间戳：JSONL 中只在刷新时间变化时写出，读取时向前填充
+SLOW_FIELDS = (('connections', 'connections_timestamp'), ('processes', 'processes_timestamp'))
+
+# 采集器自身占用的系统CPU（百分点）达到该值的样本视为被采集器扭曲
+COLLECTOR_DISTORTION_PCT = 1.0
+
+
+def _lookup(sample, path):
+    """按路径取值，缺失时返回NaN"""
+    value = sample
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def flatten_sample(sample, columns=COLUMNS):
+    """把一条嵌套的指标记录展开为按列顺序排列的浮点元组"""
+    return tuple(_lookup(sample, path) for _, path in columns)
+
+
+def thin_sample(sample, written):
+    """
+    去掉自上次写出以来未刷新的慢速层字段（不修改原样本）。
+    written 为 {字段: 上次写出时的刷新时间戳}，原地更新。
+    """
+    thin = None
+    for field, ts_field in SLOW_FIELDS:
+        ts = sample.get(ts_field)
+        if field in sample and ts is not None and written.get(field) == ts:
+            if thin is None:
+                thin = dict(sample)
+            del thin[field]
+        else:
+            written[field] = ts
+    return sample if thin is None else thin
+
+
+def fill_forward(samples):
+    """thin_sample 的逆操作：为省略的慢速层字段补上最近一次写出的值"""
+    last = {}
+    for sample in samples:
+        for field, _ in SLOW_FIELDS:
+            if field in sample:
+                last[field] = sample[field]
+            elif field in last:
+                sample[field] = last[field]
+        yield sample
+
+
+class MetricsStoreWriter:
+    """追加写入器：文件保持打开，攒够 batch_size 条记录再写盘"""
+
+    def __init__(self, path, columns=COLUMNS, batch_size=64):
+        self.path = path
+        self.columns = list(columns)
+        self.names = [name for name, _ in self.columns]
+        self.batch_size = batch_size
+        self.record = struct.Struct('<' + 'd' * len(self.columns))
+        self.pending = []
+        self.count = 0
+        self.rotated = None
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        header = None
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            try:
+                header, data_offset = _read_header(path)
+            except (ValueError, KeyError, struct.error):
+                header = None
+            # 列不一致（旧版本 / 损坏）的文件改名保留，另起新文件，而不是拒绝启动
+            if header is None or header.get('columns') != self.names:
+                base, ext = os.path.splitext(path)
+                self.rotated = f"{base}.v{header.get('version', 0) if header else 0}." \
+                               f"{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+                os.replace(path, self.rotated)
+                header = None
+        if header is not None:
+            # 续写 schema 一致的已有文件
+            self.count = (os.path.getsize(path) - data_offset) // self.record.size
+            self.fh = open(path, 'ab')
+        else:
+            self.fh = open(path, 'wb')
+            header = json.dumps({'version': VERSION, 'columns': self.names}).encode('utf-8')
+            self.fh.write(MAGIC + struct.pack('<I', len(header)) + header)
+            self.fh.flush()
+
+    def append(self, sample):
+        """追加一条嵌套字典格式的指标记录"""
+        self.append_row(flatten_sample(sample, self.columns))
+
+    def append_row(self, row):
+        """追加一条已展开的记录"""
+        self.pending.append(self.record.pack(*row))
+        self.count += 1
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.fh.write(b''.join(self.pending))
+            self.pending = []
+        self.fh.flush()
+
+    def close(self):
+        if not self.fh.closed:
+            self.flush()
+            self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_header(path):
+    with open(path, 'rb') as f:
+        if f.read(4) != MAGIC:
+            raise ValueError(f"{path} 不是指标存储文件")
+        (header_len,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    return header, 8 + header_len
+
+
+def read_header(path):
+    """读取文件头，返回 (列名列表, 数据区起始偏移)"""
+    header, data_offset = _read_header(path)
+    return header['columns'], data_offset
+
+
+def read_columns(path):
+    """只依赖标准库读取整个文件，返回 {列名: array('d')}"""
+    names, data_offset = read_header(path)
+    with open(path, 'rb') as f:
+        f.seek(data_offset)
+        raw = f.read()
+    # 丢弃写入中断留下的不完整记录
+    row_bytes = 8 * len(names)
+    raw = raw[:len(raw) - len(raw) % row_bytes]
+    flat = array('d')
+    flat.frombytes(raw)
+    if struct.pack('=d', 1.0) != struct.pack('<d', 1.0):
+        flat.byteswap()
+    return {name: flat[i::len(names)] for i, name in enumerate(names)}
+
+
+def read_numpy(path):
+    """以numpy结构化数组读取（零拷贝memmap）"""
+    import numpy as np
+
+    names, data_offset = read_header(path)
+    dtype = np.dtype([(name, '<f8') for name in names])
+    rows = (os.path.getsize(path) - data_offset) // dtype.itemsize
+    if rows == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=(rows,))
+
+
+def corrected_cpu(cpu_percent, collector_cpu_percent):
+    """
+    扣除采集器自身开销后的系统CPU使用率，以及该样本是否被采集器扭曲。
+    没有开销记录（旧数据、首个样本）时原样返回且不标记。
+    """
+    if collector_cpu_percent is None or collector_cpu_percent != collector_cpu_percent:
+        return cpu_percent, False
+    return (max(0.0, cpu_percent - collector_cpu_percent),
+            collector_cpu_percent >= COLLECTOR_DISTORTION_PCT)
+
+
+class RunningStats:
+    """增量统计：计数、均值、方差(Welford)、最值"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def update(self, value):
+        if value is None or value != value:  # 跳过NaN
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def as_dict(self):
+        if not self.count:
+            return {'average': 0, 'maximum': 0, 'minimum': 0}
+        return {'average': self.mean, 'maximum': self.maximum, 'minimum': self.minimum}
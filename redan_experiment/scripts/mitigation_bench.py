@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+NAT 加固配置的开销评估
+对每个加固 profile（conntrack sysctl + FORWARD 链规则）:
+  1) 在 nat_device 上应用该 profile
+  2) 用 load_gen.py 从 client 经 NAT 向 server 施加合法负载，
+     测量新建连接速率、吞吐与 p99 时延（重复多次取中位数）
+  3) 用 evaluation_harness 的 trial 流程检查 conntrack 是否仍观察到映射被拆除
+  4) 恢复 NAT 的原始设置
+最后给出每个 profile 相对 baseline 的性能代价与 teardown 观测率。
+窗口检查相关的 sysctl（be_liberal / tcp_loose）在每个 profile 下都记录实际值，
+baseline 因此能看出环境原本是否已启用窗口检查。
+
+用法（在 redan_experiment 目录下，实验环境已启动）:
+    python3 scripts/mitigation_bench.py --trials 10 --load-duration 10
+    python3 scripts/mitigation_bench.py --profiles baseline,no_pickup,hardened
+"""
+
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from typing import Dict, List
+
+from evaluation_harness import (ConntrackEvaluator, ExperimentDriver, FlowKey, run_trial,
+                                summarize)
+from evidence_archive import EvidenceArchive
+
+RULE_TAG = "redan-mitigation"
+LOAD_PORT = 5100
+
+# be_liberal=0 是内核默认值，baseline 下窗口检查通常已经生效；
+# 依赖它的 profile 仍显式写入，以防实验环境被改成了宽松模式
+WINDOW_CHECK = {"net.netfilter.nf_conntrack_tcp_be_liberal": "0"}
+# 不从中途报文拾取新连接，未经握手的 ACK 不会建立映射（内核默认 tcp_loose=1）
+NO_PICKUP = {"net.netfilter.nf_conntrack_tcp_loose": "0"}
+SHORT_TIMEOUTS = {
+    "net.netfilter.nf_conntrack_tcp_timeout_established": "600",
+    "net.netfilter.nf_conntrack_tcp_timeout_time_wait": "30",
+    "net.netfilter.nf_conntrack_tcp_timeout_close_wait": "15",
+    "net.netfilter.nf_conntrack_tcp_timeout_fin_wait": "30",
+}
+INVALID_DROP = ["-m", "conntrack", "--ctstate", "INVALID", "-j", "DROP"]
+RST_RATELIMIT = ["-p", "tcp", "--tcp-flags", "RST", "RST", "-m", "hashlimit",
+                 "--hashlimit-above", "20/sec", "--hashlimit-mode", "dstip",
+                 "--hashlimit-name", "redan_rst", "-j", "DROP"]
+
+PROFILES: Dict[str, dict] = {
+    "baseline": {"description": "实验环境原样（窗口检查相关 sysctl 的实际值见 settings）"},
+    "liberal": {"description": "关闭 TCP 窗口检查",
+                "sysctl": {"net.netfilter.nf_conntrack_tcp_be_liberal": "1"}},
+    "no_pickup": {"description": "不从中途报文拾取连接（tcp_loose=0；be_liberal=0 为内核默认，baseline 已启用）",
+                  "sysctl": dict(WINDOW_CHECK, **NO_PICKUP)},
+    "short_timeouts": {"description": "缩短 conntrack TCP 超时", "sysctl": SHORT_TIMEOUTS},
+    "invalid_drop": {"description": "丢弃 INVALID（依赖 be_liberal=0 的窗口检查，越窗 RST 不再被转发）",
+                     "sysctl": WINDOW_CHECK, "iptables": [INVALID_DROP]},
+    "rst_ratelimit": {"description": "按目的地址限制 RST 速率", "iptables": [RST_RATELIMIT]},
+    "hardened": {"description": "以上全部",
+                 "sysctl": dict(WINDOW_CHECK, **NO_PICKUP, **SHORT_TIMEOUTS),
+                 "iptables": [INVALID_DROP, RST_RATELIMIT]},
+}
+
+
+class NatHardening:
+    """在 NAT 容器内应用/撤销一个 profile；sysctl 原值在首次使用前记录"""
+
+    def __init__(self, nat_container: str):
+        self.nat_container = nat_container
+        self.original: Dict[str, str] = {}
+
+    def _exec(self, cmd: str) -> str:
+        p = subprocess.run(["docker", "exec", self.nat_container, "sh", "-c", cmd],
+                           capture_output=True, text=True, timeout=30)
+        if p.returncode != 0:
+            raise RuntimeError(f"{self.nat_container} cmd failed: {cmd}\n{p.stderr}")
+        return p.stdout
+
+    def remember(self, keys) -> None:
+        for key in keys:
+            if key not in self.original:
+                self.original[key] = self._exec(f"sysctl -n {key}").strip()
+
+    def current(self, keys) -> Dict[str, str]:
+        return {key: self._exec(f"sysctl -n {key}").strip() for key in keys}
+
+    def apply(self, profile: dict) -> None:
+        sysctls = profile.get("sysctl", {})
+        self.remember(sysctls)
+        for key, value in sysctls.items():
+            self._exec(f"sysctl -qw {key}={value}")
+        for rule in profile.get("iptables", []):
+            args = " ".join(shlex.quote(a) for a in rule)
+            self._exec(f"iptables -I FORWARD 1 {args} -m comment --comment {RULE_TAG}")
+
+    def restore(self) -> None:
+        for key, value in self.original.items():
+            self._exec(f"sysctl -qw {key}={value}")
+        self._exec(f"iptables -S FORWARD | grep -- '{RULE_TAG}' | sed 's/^-A /-D /' | "
+                   f"while read -r rule; do eval iptables $rule; done")
+
+
+class MitigationBench:
+    def __init__(self, nat_container: str, client_container: str, server_container: str,
+                 flow: FlowKey, out_dir: str = "./output/mitigation", trials: int = 10,
+                 load_duration: float = 10.0, load_repeats: int = 3, concurrency: int = 16,
+                 streams: int = 4, mode: str = "event", event_timeout: float = 10.0):
+        self.nat = NatHardening(nat_container)
+        self.flow = flow
+        self.out_dir = out_dir
+        self.trials = trials
+        self.load_duration = load_duration
+        self.load_repeats = load_repeats
+        self.concurrency = concurrency
+        self.streams = streams
+        self.mode = mode
+        self.event_timeout = event_timeout
+        self.driver = ExperimentDriver(client_container, server_container)
+
+    def measure_load(self) -> dict:
+        """重复 load_repeats 次，关键指标取中位数"""
+        runs = [self.driver.run_load_client(self.flow.server_ip, LOAD_PORT, self.load_duration,
+                                            self.concurrency, self.streams)
+                for _ in range(self.load_repeats)]
+
+        def median(path):
+            values = []
+            for r in runs:
+                v = r
+                for k in path:
+                    v = v.get(k) if isinstance(v, dict) else None
+                if v is not None:
+                    values.append(v)
+            return statistics.median(values) if values else None
+
+        return {
+            "connections_per_second": median(("connection_rate", "connections_per_second")),
+            "connect_p99_ms": median(("connection_rate", "p99_ms")),
+            "mbit_per_second": median(("throughput", "mbit_per_second")),
+            "latency_p50_ms": median(("latency", "p50_ms")),
+            "latency_p99_ms": median(("latency", "p99_ms")),
+            "runs": runs,
+        }
+
+    def run_trials(self, name: str, archive: EvidenceArchive) -> dict:
+        evaluator = ConntrackEvaluator(self.nat.nat_container, self.flow,
+                                       out_dir=os.path.join(self.out_dir, name))
+        results = []
+        try:
+            for i in range(1, self.trials + 1):
+                r = run_trial(i, evaluator, self.driver, mode=self.mode, event_timeout=self.event_timeout,
+                              archive=archive, environment=name)
+                results.append(r)
+                print(f"  [{name} trial {i:03d}] dos_observed={r.dos_observed}")
+                time.sleep(1.0)
+        finally:
+            evaluator.close()
+        return summarize(results, include_results=False)
+
+    def run(self, names: List[str]) -> dict:
+        os.makedirs(self.out_dir, exist_ok=True)
+        archive = EvidenceArchive(os.path.join(self.out_dir, "evidence.sqlite"))
+        self.driver.ensure_server_running()
+        self.driver.ensure_load_server(LOAD_PORT)
+        # 窗口检查相关的 sysctl 总是记录，baseline 的 settings 因此显示环境的实际取值
+        touched = sorted({k for n in names for k in PROFILES[n].get("sysctl", {})}
+                         | set(WINDOW_CHECK) | set(NO_PICKUP))
+        self.nat.remember(touched)
+        print("[*] current settings: " + ", ".join(
+            f"{k.rsplit('.', 1)[-1]}={self.nat.original[k]}" for k in touched))
+
+        profiles = {}
+        try:
+            for name in names:
+                profile = PROFILES[name]
+                print(f"[*] profile {name}: {profile['description']}")
+                self.nat.apply(profile)
+                try:
+                    entry = {
+                        "description": profile["description"],
+                        "settings": self.nat.current(touched),
+                        "iptables": [" ".join(r) for r in profile.get("iptables", [])],
+                        "load": self.measure_load(),
+                        "harness": self.run_trials(name, archive) if self.trials else None,
+                    }
+                finally:
+                    self.nat.restore()
+                profiles[name] = entry
+        finally:
+            archive.close()
+
+        summary = {
+            "flow": asdict(self.flow),
+            "load_duration": self.load_duration,
+            "load_repeats": self.load_repeats,
+            "trials_per_profile": self.trials,
+            "evidence_archive": os.path.basename(archive.path),
+            "original_settings": self.nat.original,
+            "profiles": profiles,
+            "costs": relative_costs(profiles, reference="baseline" if "baseline" in profiles else names[0]),
+        }
+        with open(os.path.join(self.out_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return summary
+
+
+def _change(value, ref):
+    if value is None or not ref:
+        return None
+    return (value - ref) / ref * 100
+
+
+def relative_costs(profiles: Dict[str, dict], reference: str) -> Dict[str, dict]:
+    """各 profile 相对参考 profile 的变化百分比，以及 teardown 是否仍被观察到"""
+    ref = profiles[reference]["load"]
+    costs = {}
+    for name, p in profiles.items():
+        load, harness = p["load"], p["harness"]
+        costs[name] = {
+            "connections_per_second_change_pct": _change(load["connections_per_second"],
+                                                         ref["connections_per_second"]),
+            "throughput_change_pct": _change(load["mbit_per_second"], ref["mbit_per_second"]),
+            "latency_p99_change_pct": _change(load["latency_p99_ms"], ref["latency_p99_ms"]),
+            "teardown_rate": harness["success_rate"] if harness else None,
+            "teardown_rate_ci95": harness["success_rate_ci95"] if harness else None,
+            "teardown_observed": bool(harness and harness["success"]),
+        }
+    return costs
+
+
+def print_table(summary: dict) -> None:
+    def fmt(v, spec="+.1f"):
+        return "n/a" if v is None else format(v, spec)
+
+    print(f"\n{'profile':<16}{'conn/s':>10}{'Mbit/s':>10}{'p99 ms':>9}"
+          f"{'Δconn%':>9}{'Δtput%':>9}{'Δp99%':>9}{'teardown':>10}")
+    for name, p in summary["profiles"].items():
+        load, cost = p["load"], summary["costs"][name]
+        rate = cost["teardown_rate"]
+        print(f"{name:<16}{fmt(load['connections_per_second'], '.0f'):>10}"
+              f"{fmt(load['mbit_per_second'], '.0f'):>10}{fmt(load['latency_p99_ms'], '.2f'):>9}"
+              f"{fmt(cost['connections_per_second_change_pct']):>9}{fmt(cost['throughput_change_pct']):>9}"
+              f"{fmt(cost['latency_p99_change_pct']):>9}{fmt(rate, '.2f'):>10}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cost of NAT hardening profiles")
+    parser.add_argument("--profiles", default=",".join(PROFILES),
+                        help=f"comma-separated subset of: {', '.join(PROFILES)}")
+    parser.add_argument("--trials", type=int, default=10, help="harness trials per profile (0 to skip)")
+    parser.add_argument("--load-duration", type=float, default=10.0, help="seconds per load measurement")
+    parser.add_argument("--load-repeats", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--mode", choices=["event", "snapshot"], default="event")
+    parser.add_argument("--event-timeout", type=float, default=10.0)
+    parser.add_argument("--prefix", default=os.environ.get("LAB_PREFIX", ""), help="container name prefix")
+    parser.add_argument("--internal-net", default="192.168.1")
+    parser.add_argument("--external-net", default="10.0.0")
+    parser.add_argument("--out-dir", default="./output/mitigation")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [n.strip() for n in args.profiles.split(",") if n.strip()]
+    unknown = [n for n in names if n not in PROFILES]
+    if unknown:
+        print(f"[!] unknown profiles: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    flow = FlowKey(client_ip=f"{args.internal_net}.100", server_ip=f"{args.external_net}.10", dport=5003)
+    bench = MitigationBench(args.prefix + "nat_container", args.prefix + "client_container",
+                            args.prefix + "server_container", flow, out_dir=args.out_dir,
+                            trials=args.trials, load_duration=args.load_duration,
+                            load_repeats=args.load_repeats, concurrency=args.concurrency,
+                            streams=args.streams, mode=args.mode, event_timeout=args.event_timeout)
+    summary = bench.run(names)
+    print_table(summary)
+    print(f"\n[+] Summary written to {os.path.join(args.out_dir, 'summary.json')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
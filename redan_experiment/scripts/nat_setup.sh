@@ -17,10 +17,13 @@ iptables -F
 
 # 配置iptables进行NAT
 
+NAT_INTERNAL_IP=${NAT_INTERNAL_IP:-192.168.1.2}
+NAT_EXTERNAL_IP=${NAT_EXTERNAL_IP:-10.0.0.2}
+
 # 查找 internal_net 对应的 interface
-IN_IF=$(ip -o addr show | grep 192.168.1.2 | awk '{print $2}')
+IN_IF=$(ip -o addr show | grep -w "$NAT_INTERNAL_IP" | awk '{print $2}')
 # 查找 external_net 对应的 interface
-OUT_IF=$(ip -o addr show | grep 10.0.0.2 | awk '{print $2}')
+OUT_IF=$(ip -o addr show | grep -w "$NAT_EXTERNAL_IP" | awk '{print $2}')
 
 echo "[nat] internal IF: $IN_IF"
 echo "[nat] external IF: $OUT_IF"
@@ -42,8 +45,14 @@ iptables -A FORWARD -i "$OUT_IF" -o "$IN_IF" -m state --state RELATED,ESTABLISHE
 # 启动流量捕获
 tcpdump -i any -w /logs/nat_traffic.pcap &
 
+# 可选：在外部接口上启动越窗 RST / PUSH-ACK 检测器
+if [ "${OOW_DETECTOR:-0}" = "1" ]; then
+    python3 /scripts/oow_detector.py --iface "$OUT_IF" --output /logs/oow_detector.json \
+        > /logs/oow_detector.log 2>&1 &
+fi
+
 echo "[+] NAT设备配置完成"
-echo "[*] NAT网关: 192.168.1.2 (内部), 10.0.0.2 (外部)"
+echo "[*] NAT网关: $NAT_INTERNAL_IP (内部), $NAT_EXTERNAL_IP (外部)"
 
 # 保持容器运行
 tail -f /dev/null
\ No newline at end of file
@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+"""
+NAT 侧越窗 RST / PUSH-ACK 检测器（防御用传感器）
+在 nat_device 容器内运行，仅依赖标准库:
+- 通过 AF_PACKET + TPACKET_V3 的 mmap 接收环读取报文，内核按块批量交付，
+  用户态直接在共享内存上解析，不逐包复制
+- 每条经过 NAT 的 TCP 流（即每个 conntrack 映射在线路上的两端）在一个
+  定长、数组实现的开放寻址表中保存双向的序列号窗口状态，内存上限固定
+- 窗口判定沿用 nf_conntrack tcp_in_window 的简化形式，对越窗的 RST、
+  PUSH/ACK 以及指向不存在映射的 RST、PUSH/ACK 分别计数并记录告警
+- 必须只监听 NAT 的一侧（默认为外部接口）: SNAT 前后的两段报文元组不同，
+  同时监听内外两侧时没有一条流能学到双向窗口，所有 RST 都只能记为 rst_unverified
+
+运行（nat_device 容器内，需要 CAP_NET_RAW）:
+    python3 /scripts/oow_detector.py --output /logs/oow_detector.json
+    python3 /scripts/oow_detector.py --iface eth1 --output /logs/oow_detector.json
+"""
+
+import argparse
+import collections
+import ctypes
+import json
+import mmap
+import os
+import select
+import socket
+import struct
+import subprocess
+import time
+from array import array
+
+# ---- TPACKET_V3 常量（linux/if_packet.h） ----
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+SO_ATTACH_FILTER = 26
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+PACKET_OUTGOING = 4
+
+# struct tpacket_block_desc: version, offset_to_priv, 然后 tpacket_hdr_v1
+BLOCK_STATUS_OFF = 8
+BLOCK_NUM_PKTS_OFF = 12
+# struct tpacket3_hdr 的前 8 个字段；sockaddr_ll 紧随 TPACKET_ALIGN(sizeof(tpacket3_hdr)) 之后
+TPACKET3_HDR = struct.Struct('=IIIIIIHH')
+TPACKET3_HDRLEN = 48
+SLL_PKTTYPE_OFF = TPACKET3_HDRLEN + 10
+
+# ---- pcap 链路类型 ----
+LINKTYPE_ETHERNET = 1
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+# ---- TCP ----
+FIN, SYN, RST, PSH, ACK = 0x01, 0x02, 0x04, 0x08, 0x10
+SEQ_MASK = 0xFFFFFFFF
+IPV4 = struct.Struct('!BBHHHBBHII')
+TCP = struct.Struct('!HHIIHH')
+# 中途接入（未见 SYN）的流不知道窗口扩大因子，按 Linux 默认的 7 估计
+DEFAULT_WSCALE = 7
+MIN_ACK_WINDOW = 66000
+
+# 只把 IPv4/TCP 交给用户态的经典 BPF（作用于 AF_PACKET 的链路层帧）:
+#   ldh [12]; jeq #0x800 jt 0 jf 3; ldb [23]; jeq #6 jt 0 jf 1; ret #65535; ret #0
+TCP_ONLY_BPF = [
+    (0x28, 0, 0, 12),
+    (0x15, 0, 3, ETH_P_IP),
+    (0x30, 0, 0, 23),
+    (0x15, 0, 1, 6),
+    (0x06, 0, 0, 0xFFFF),
+    (0x06, 0, 0, 0),
+]
+
+
+def _before(a, b):
+    """序列号空间内 a 在 b 之前（模 2^32）"""
+    return ((a - b) & SEQ_MASK) > 0x7FFFFFFF
+
+
+def _after(a, b):
+    return ((b - a) & SEQ_MASK) > 0x7FFFFFFF
+
+
+def ip_str(addr):
+    return socket.inet_ntoa(struct.pack('!I', addr))
+
+
+class FlowTable:
+    """
+    定长开放寻址哈希表，所有字段存放在 array 中（每个槽位约 50 字节）。
+    查找最多探测 probe 个槽位；插入时若探测范围内没有空位，则淘汰其中
+    优先级最低的流（仅见过单向报文的流优先，其次最久未活动）。
+    键为无序端点对，dir=0 表示从 (a, port_a) 发出。
+    """
+    EMPTY, USED, DELETED = 0, 1, 2
+
+    def __init__(self, capacity=65536, probe=16):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.probe = probe
+        self.slot = array('B', bytes(capacity))
+        self.key_a = array('I', bytes(4 * capacity))
+        self.key_b = array('I', bytes(4 * capacity))
+        self.key_ports = array('I', bytes(4 * capacity))
+        self.last_seen = array('d', bytes(8 * capacity))
+        # 以下按 slot*2+dir 索引
+        self.end = array('I', bytes(8 * capacity))
+        self.maxend = array('I', bytes(8 * capacity))
+        self.maxwin = array('I', bytes(8 * capacity))
+        self.scale = array('b', bytes(2 * capacity))
+        self.known = array('B', bytes(2 * capacity))
+        self.size = 0
+        self.evictions = 0
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (
+            self.slot, self.key_a, self.key_b, self.key_ports, self.last_seen,
+            self.end, self.maxend, self.maxwin, self.scale, self.known))
+
+    def _hash(self, a, b, ports):
+        x = ((a * 0x9E3779B1) ^ (b * 0x85EBCA6B) ^ (ports * 0xC2B2AE35)) & 0xFFFFFFFF
+        x ^= x >> 16
+        x = (x * 0x7FEB352D) & 0xFFFFFFFF
+        return x ^ (x >> 15)
+
+    def lookup(self, a, b, ports, now=0.0, create=False):
+        """返回槽位号；不存在且 create=False 时返回 -1"""
+        slot, key_a, key_b, key_ports = self.slot, self.key_a, self.key_b, self.key_ports
+        mask = self.mask
+        h = self._hash(a, b, ports)
+        free = -1
+        victim, victim_rank = -1, None
+        for p in range(self.probe):
+            s = (h + p) & mask
+            st = slot[s]
+            if st == 0:
+                if free < 0:
+                    free = s
+                break
+            if st == 2:
+                if free < 0:
+                    free = s
+                continue
+            if key_a[s] == a and key_b[s] == b and key_ports[s] == ports:
+                return s
+            rank = (self.known[2 * s] & self.known[2 * s + 1], self.last_seen[s])
+            if victim_rank is None or rank < victim_rank:
+                victim, victim_rank = s, rank
+        if not create:
+            return -1
+        if free < 0:
+            s = victim
+            self.evictions += 1
+        else:
+            s = free
+            self.size += 1
+        slot[s] = 1
+        key_a[s], key_b[s], key_ports[s] = a, b, ports
+        self.last_seen[s] = now
+        for i in (2 * s, 2 * s + 1):
+            self.end[i] = self.maxend[i] = self.maxwin[i] = 0
+            self.scale[i] = -1
+            self.known[i] = 0
+        return s
+
+    def delete(self, s):
+        if self.slot[s] == 1:
+            self.slot[s] = 2
+            self.size -= 1
+
+
+class OutOfWindowDetector:
+    def __init__(self, capacity=65536, probe=16, max_alerts=1000, learn_midstream=True):
+        self.table = FlowTable(capacity, probe)
+        self.learn_midstream = learn_midstream
+        self.alerts = collections.deque(maxlen=max_alerts)
+        self.counters = collections.Counter()
+
+    def _alert(self, kind, ts, saddr, sport, daddr, dport, seq, ack, flags, s=-1, si=0):
+        entry = {
+            'ts': ts, 'kind': kind,
+            'src': f"{ip_str(saddr)}:{sport}", 'dst': f"{ip_str(daddr)}:{dport}",
+            'seq': seq, 'ack': ack, 'flags': flags,
+        }
+        if s >= 0:
+            t = self.table
+            entry['expected_seq'] = t.end[si]
+            entry['window'] = [(t.end[si] - t.maxwin[si ^ 1]) & SEQ_MASK, t.maxend[si]]
+        self.alerts.append(entry)
+
+    def process_ip(self, ts, buf, off, end=None):
+        """处理 buf[off:] 处的一个 IPv4 报文（非 IPv4/TCP 直接忽略）"""
+        counters = self.counters
+        counters['packets'] += 1
+        ver_ihl, _, total_len, _, frag, _, proto, _, saddr, daddr = IPV4.unpack_from(buf, off)
+        if ver_ihl >> 4 != 4 or proto != 6 or frag & 0x1FFF:
+            return
+        ihl = (ver_ihl & 0x0F) * 4
+        t = off + ihl
+        if end is not None and t + 20 > end:
+            counters['truncated'] += 1
+            return
+        sport, dport, seq, ack, off_flags, win = TCP.unpack_from(buf, t)
+        doff = (off_flags >> 12) * 4
+        flags = off_flags & 0x3F
+        paylen = total_len - ihl - doff
+        counters['tcp'] += 1
+
+        if (saddr, sport) <= (daddr, dport):
+            a, b, ports, d = saddr, daddr, (sport << 16) | dport, 0
+        else:
+            a, b, ports, d = daddr, saddr, (dport << 16) | sport, 1
+
+        table = self.table
+        suspicious = flags & RST or (flags & (PSH | ACK)) == (PSH | ACK)
+        create = bool(flags & SYN) or (self.learn_midstream and not flags & RST)
+        s = table.lookup(a, b, ports, ts, create)
+        if s < 0:
+            # 没有任何映射对应的 RST / PUSH-ACK：盲猜端口的探测
+            if flags & RST:
+                counters['rst_unmatched'] += 1
+                self._alert('rst_unmatched', ts, saddr, sport, daddr, dport, seq, ack, flags)
+            elif suspicious:
+                counters['pshack_unmatched'] += 1
+            return
+        table.last_seen[s] = ts
+        si, ri = 2 * s + d, 2 * s + (d ^ 1)
+        known, tend, maxend, maxwin, scale = table.known, table.end, table.maxend, table.maxwin, table.scale
+        seg_end = (seq + paylen + (1 if flags & SYN else 0) + (1 if flags & FIN else 0)) & SEQ_MASK
+
+        if flags & SYN:
+            wscale = self._wscale(buf, t + 20, t + doff)
+            if not flags & ACK:
+                # 新连接（可能复用了旧的四元组）：重置双向状态
+                known[ri] = 0
+                scale[ri] = -1
+            scale[si] = wscale
+            if flags & ACK:
+                if scale[si] < 0 or scale[ri] < 0:
+                    scale[si] = scale[ri] = 0
+                m = (ack + win) & SEQ_MASK
+                if known[ri] and _after(m, maxend[ri]):
+                    maxend[ri] = m
+            tend[si] = seg_end
+            maxwin[si] = max(win, 1)
+            maxend[si] = (seg_end + maxwin[si]) & SEQ_MASK
+            known[si] = 1
+            counters['syn'] += 1
+            return
+
+        sc = scale[si]
+        win_scaled = win << (sc if sc >= 0 else DEFAULT_WSCALE)
+
+        if not (known[si] and known[ri]):
+            # 只见过单向报文时无法判定窗口；RST 不参与学习，避免被伪造报文污染
+            if flags & RST:
+                counters['rst_unverified'] += 1
+                return
+            if suspicious and not (known[si] or known[ri]):
+                # 中途接入的新流以 PUSH/ACK 开头：可能是真实流量，也可能是盲猜映射的探测
+                counters['pshack_unverified'] += 1
+            if not known[si]:
+                tend[si] = seg_end
+                maxwin[si] = max(win_scaled, 1)
+                maxend[si] = (seg_end + maxwin[si]) & SEQ_MASK
+                known[si] = 1
+            if flags & ACK and known[ri]:
+                m = (ack + win_scaled) & SEQ_MASK
+                if _after(m, maxend[ri]):
+                    maxend[ri] = m
+            return
+
+        seq_ok = (_before(seq, (maxend[si] + 1) & SEQ_MASK)
+                  and _after(seg_end, (tend[si] - maxwin[ri] - 1) & SEQ_MASK))
+        ack_ok = (not flags & ACK) or (
+            _before(ack, (tend[ri] + 1) & SEQ_MASK)
+            and _after(ack, (tend[ri] - max(maxwin[si], MIN_ACK_WINDOW) - 1) & SEQ_MASK))
+
+        if flags & RST:
+            if not seq_ok:
+                counters['rst_oow'] += 1
+                self._alert('rst_oow', ts, saddr, sport, daddr, dport, seq, ack, flags, s, si)
+            elif seq != tend[si]:
+                # 落在窗口内但不是精确的下一个序号（RFC 5961 会回复 challenge ACK）
+                counters['rst_inexact'] += 1
+                self._alert('rst_inexact', ts, saddr, sport, daddr, dport, seq, ack, flags, s, si)
+            else:
+                counters['rst_ok'] += 1
+                table.delete(s)
+            return
+
+        if not (seq_ok and ack_ok):
+            if suspicious:
+                counters['pshack_oow'] += 1
+                self._alert('pshack_oow', ts, saddr, sport, daddr, dport, seq, ack, flags, s, si)
+            else:
+                counters['other_oow'] += 1
+            return
+
+        if _after(seg_end, tend[si]):
+            tend[si] = seg_end
+        if win_scaled > maxwin[si]:
+            maxwin[si] = win_scaled
+        if flags & ACK:
+            m = (ack + win_scaled) & SEQ_MASK
+            if _after(m, maxend[ri]):
+                maxend[ri] = m
+
+    @staticmethod
+    def _wscale(buf, start, end):
+        """解析 SYN 中的窗口扩大选项，未携带时返回 -1"""
+        i = start
+        while i < end:
+            kind = buf[i]
+            if kind == 0:
+                break
+            if kind == 1:
+                i += 1
+                continue
+            if i + 1 >= end:
+                break
+            length = buf[i + 1]
+            if kind == 3 and length == 3 and i + 2 < end:
+                return min(buf[i + 2], 14)
+            if length < 2:
+                break
+            i += length
+        return -1
+
+    def seed_conntrack(self, path='/proc/net/nf_conntrack', now=0.0):
+        """用当前 conntrack 表中的 TCP 映射预建流表项（两个方向的元组都加入）"""
+        seeded = 0
+        try:
+            with open(path, 'r') as f:
+                lines = f.readlines()
+        except OSError:
+            return 0
+        for line in lines:
+            if ' tcp ' not in line:
+                continue
+            fields = [tok.split('=', 1) for tok in line.split() if '=' in tok]
+            tuples = []
+            cur = {}
+            for k, v in fields:
+                if k in cur and k in ('src', 'dst', 'sport', 'dport'):
+                    tuples.append(cur)
+                    cur = {}
+                cur[k] = v
+            tuples.append(cur)
+            for tp in tuples:
+                if not all(k in tp for k in ('src', 'dst', 'sport', 'dport')):
+                    continue
+                try:
+                    saddr = struct.unpack('!I', socket.inet_aton(tp['src']))[0]
+                    daddr = struct.unpack('!I', socket.inet_aton(tp['dst']))[0]
+                except OSError:
+                    continue
+                sport, dport = int(tp['sport']), int(tp['dport'])
+                if (saddr, sport) <= (daddr, dport):
+                    self.table.lookup(saddr, daddr, (sport << 16) | dport, now, True)
+                else:
+                    self.table.lookup(daddr, saddr, (dport << 16) | sport, now, True)
+                seeded += 1
+        return seeded
+
+    def report(self):
+        return {
+            'ts': time.time(),
+            'counters': dict(self.counters),
+            'flows': self.table.size,
+            'capacity': self.table.capacity,
+            'evictions': self.table.evictions,
+            'table_bytes': self.table.nbytes(),
+            'alerts': list(self.alerts),
+        }
+
+
+def link_offset(linktype, data):
+    """返回链路层帧中 IPv4 头的偏移；非 IPv4 返回 -1"""
+    if linktype == LINKTYPE_ETHERNET:
+        off, ethertype = 12, None
+        while True:
+            if len(data) < off + 2:
+                return -1
+            ethertype = struct.unpack_from('!H', data, off)[0]
+            if ethertype in (0x8100, 0x88A8):
+                off += 4
+                continue
+            break
+        return off + 2 if ethertype == ETH_P_IP else -1
+    if linktype == LINKTYPE_LINUX_SLL:
+        if len(data) < 16:
+            return -1
+        return 16 if struct.unpack_from('!H', data, 14)[0] == ETH_P_IP else -1
+    if linktype == LINKTYPE_LINUX_SLL2:
+        if len(data) < 20:
+            return -1
+        return 20 if struct.unpack_from('!H', data, 0)[0] == ETH_P_IP else -1
+    raise ValueError(f"unsupported pcap linktype: {linktype}")
+
+
+def link_pkttype(linktype, data):
+    """Linux SLL / SLL2 抓包中的 sll_pkttype；以太网帧不携带该信息，返回 None"""
+    if linktype == LINKTYPE_LINUX_SLL and len(data) >= 2:
+        return struct.unpack_from('!H', data, 0)[0]
+    if linktype == LINKTYPE_LINUX_SLL2 and len(data) >= 11:
+        return data[10]
+    return None
+
+
+def skip_pkttype(pkttype, all_interfaces):
+    """
+    是否丢弃该报文。只有在所有接口上抓包时，本机发出的副本（PACKET_OUTGOING）
+    才与入接口上的接收副本重复；绑定单个接口（如 NAT 外部接口）时，
+    SNAT 之后的 client->server 报文只以 OUTGOING 出现，必须保留，否则流永远学不到双向窗口。
+    """
+    return all_interfaces and pkttype == PACKET_OUTGOING
+
+
+def read_pcap(path):
+    """读取经典 pcap 文件，返回 (linktype, [(ts, data), ...])"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    magic = raw[:4]
+    if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+        endian = '<'
+    elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+        endian = '>'
+    else:
+        raise ValueError(f"{path}: not a classic pcap file (pcapng is not supported)")
+    nano = magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d')
+    linktype = struct.unpack_from(endian + 'I', raw, 20)[0] & 0x0FFFFFFF
+    rec = struct.Struct(endian + 'IIII')
+    packets = []
+    off = 24
+    divisor = 1e9 if nano else 1e6
+    while off + 16 <= len(raw):
+        sec, frac, caplen, _ = rec.unpack_from(raw, off)
+        off += 16
+        packets.append((sec + frac / divisor, raw[off:off + caplen]))
+        off += caplen
+    return linktype, packets
+
+
+def external_interface(ip=None):
+    """与 nat_setup.sh 相同：按 NAT_EXTERNAL_IP 找到 NAT 外部接口名，找不到返回 None"""
+    ip = ip or os.environ.get('NAT_EXTERNAL_IP', '10.0.0.2')
+    try:
+        out = subprocess.run(['ip', '-o', '-4', 'addr', 'show'], stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    except OSError:
+        return None
+    for line in out.splitlines():
+        # "3: eth1    inet 10.0.0.2/24 brd 10.0.0.255 scope global eth1 ..."
+        parts = line.split()
+        if len(parts) >= 4 and parts[3].split('/')[0] == ip:
+            return parts[1].split('@')[0]
+    return None
+
+
+class sock_filter(ctypes.Structure):
+    _fields_ = [('code', ctypes.c_uint16), ('jt', ctypes.c_uint8),
+                ('jf', ctypes.c_uint8), ('k', ctypes.c_uint32)]
+
+
+class sock_fprog(ctypes.Structure):
+    _fields_ = [('len', ctypes.c_uint16), ('filter', ctypes.POINTER(sock_filter))]
+
+
+class PacketRing:
+    """
+    AF_PACKET TPACKET_V3 接收环。内核把报文成批写入 block，
+    block_status 置为 TP_STATUS_USER 后交给用户态，处理完再归还内核。
+    """
+
+    def __init__(self, iface=None, block_size=1 << 20, block_nr=16, frame_size=2048,
+                 retire_ms=50, tcp_only=True):
+        self.block_size = block_size
+        self.block_nr = block_nr
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        if tcp_only:
+            self._attach_filter(TCP_ONLY_BPF)
+        self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+        # struct tpacket_req3
+        req = struct.pack('=7I', block_size, block_nr, frame_size,
+                          block_size * block_nr // frame_size, retire_ms, 0, 0)
+        self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+        self.ring = mmap.mmap(self.sock.fileno(), block_size * block_nr,
+                              mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        if iface:
+            self.sock.bind((iface, ETH_P_ALL))
+        # 回环接口上每个报文同时以发出和接收两个副本出现，与监听所有接口一样需要去重
+        self.dedupe_outgoing = not iface or iface == 'lo'
+        self.poller = select.poll()
+        self.poller.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+        self.current = 0
+
+    def _attach_filter(self, program):
+        insns = (sock_filter * len(program))(*[sock_filter(*ins) for ins in program])
+        fprog = sock_fprog(len(program), insns)
+        self._filter = (insns, fprog)
+        self.sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER,
+                             ctypes.string_at(ctypes.addressof(fprog), ctypes.sizeof(fprog)))
+
+    def run(self, handler, timeout_ms=1000, should_stop=None):
+        """
+        逐块遍历接收环，对每个收到的报文调用 handler(ts, ring, net_off, end)；
+        在所有接口（或回环接口）上抓包时跳过本机发出的副本（PACKET_OUTGOING），
+        避免同一报文被计两次；绑定单个物理接口时保留，见 skip_pkttype。
+        """
+        ring, bs = self.ring, self.block_size
+        dedupe = self.dedupe_outgoing
+        unpack_hdr = TPACKET3_HDR.unpack_from
+        while should_stop is None or not should_stop():
+            base = self.current * bs
+            status = struct.unpack_from('=I', ring, base + BLOCK_STATUS_OFF)[0]
+            if not status & TP_STATUS_USER:
+                self.poller.poll(timeout_ms)
+                continue
+            num_pkts, pkt = struct.unpack_from('=II', ring, base + BLOCK_NUM_PKTS_OFF)
+            pkt += base
+            for _ in range(num_pkts):
+                next_off, sec, nsec, snaplen, _, _, mac, net = unpack_hdr(ring, pkt)
+                if not (dedupe and ring[pkt + SLL_PKTTYPE_OFF] == PACKET_OUTGOING):
+                    handler(sec + nsec * 1e-9, ring, pkt + net, pkt + mac + snaplen)
+                pkt += next_off
+            struct.pack_into('=I', ring, base + BLOCK_STATUS_OFF, TP_STATUS_KERNEL)
+            self.current = (self.current + 1) % self.block_nr
+
+    def close(self):
+        self.ring.close()
+        self.sock.close()
+
+
+def write_report(path, report):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Out-of-window RST / PUSH-ACK detector for the NAT device")
+    parser.add_argument('--iface', default=None,
+                        help='interface to capture on (default: the NAT external interface, '
+                             'found via NAT_EXTERNAL_IP)')
+    parser.add_argument('--capacity', type=int, default=65536, help='flow table slots (power of two)')
+    parser.add_argument('--block-size', type=int, default=1 << 20)
+    parser.add_argument('--block-nr', type=int, default=16)
+    parser.add_argument('--report-interval', type=float, default=5.0)
+    parser.add_argument('--output', default='/logs/oow_detector.json')
+    parser.add_argument('--no-seed', action='store_true', help='do not pre-populate from nf_conntrack')
+    args = parser.parse_args(argv)
+    # 不支持监听所有接口：内外两侧的报文经 SNAT 后属于不同元组，窗口无法配对
+    iface = args.iface or external_interface()
+    if not iface:
+        parser.error("cannot find the NAT external interface; pass --iface")
+
+    detector = OutOfWindowDetector(capacity=args.capacity)
+    if not args.no_seed:
+        print(f"[*] 从 conntrack 表预置了 {detector.seed_conntrack(now=time.time())} 个流元组")
+    ring = PacketRing(iface, block_size=args.block_size, block_nr=args.block_nr)
+    print(f"[*] 在 {iface} 上监听，流表 {args.capacity} 槽 "
+          f"({detector.table.nbytes() / 1024:.0f} KB)")
+
+    next_report = [time.monotonic() + args.report_interval]
+
+    def should_stop():
+        now = time.monotonic()
+        if now >= next_report[0]:
+            next_report[0] = now + args.report_interval
+            report = detector.report()
+            write_report(args.output, report)
+            c = report['counters']
+            print(f"[{time.strftime('%H:%M:%S')}] tcp={c.get('tcp', 0)} flows={report['flows']} "
+                  f"rst_oow={c.get('rst_oow', 0)} rst_inexact={c.get('rst_inexact', 0)} "
+                  f"rst_unmatched={c.get('rst_unmatched', 0)} pshack_oow={c.get('pshack_oow', 0)}")
+        return False
+
+    try:
+        ring.run(detector.process_ip, timeout_ms=int(args.report_interval * 1000), should_stop=should_stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        write_report(args.output, detector.report())
+        ring.close()
+
+
+if __name__ == "__main__":
+    main()
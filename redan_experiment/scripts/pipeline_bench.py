@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+分析流水线的合成数据基准
+按给定规模（1e3 ~ 1e7 个样本）生成合成的 system_metrics.jsonl / system_metrics.bin、
+connection_monitor.json、attack_statistics.json 以及评估 summary.json，
+分别测量各阶段的耗时与峰值内存:
+  collector          MetricsCollector.record_sample 逐条写入 + generate_summary
+  effect             AttackEffectAnalyzer 加载 + analyze_attack_effect + generate_timeline
+  summary/<源>       analyze_results.summarize_output（仅标准库）
+  analyzer/<源>      ReDANAnalyzer 加载 + 各项分析 + 图表聚合（--render 时再渲染图表）
+  runs               run_stats.RunAggregator 汇总评估 summary.json + evidence.sqlite
+<源> 为 jsonl 或 store（列式存储），两者读取的是同一份数据。
+
+计时、tracemalloc 峰值内存、cProfile / pyinstrument 分别在独立的轮次中进行，互不干扰。
+每次运行的结果追加到历史文件，并与上一个版本（或 --baseline 指定的版本）逐项比较，
+耗时或峰值内存超过阈值即标记为回退。
+
+用法:
+    python3 scripts/pipeline_bench.py --sizes 1e3,1e4,1e5
+    python3 scripts/pipeline_bench.py --sizes 1e6 --stages summary,analyzer --profile cprofile
+    python3 scripts/pipeline_bench.py --sizes 1e5 --baseline <版本或标签> --fail-on-regression
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from evidence_archive import EvidenceArchive
+from metrics_store import MetricsStoreWriter, thin_sample
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATOR_VERSION = 4
+INTERVAL = 0.1
+MONITOR_PORTS = [('http', 80), ('ssh', 22)]
+# 重复使用的样本池大小：collector 阶段只对池中样本做浅拷贝，样本构造不计入耗时
+SAMPLE_POOL = 4096
+STAGES = ['collector', 'effect', 'summary', 'analyzer', 'runs']
+SOURCES = ['jsonl', 'store']
+
+
+def _parse_size(text):
+    return int(float(text))
+
+
+def _attack_window(n):
+    """攻击发生在采集时长的 40% ~ 70% 区间"""
+    return int(n * 0.4), int(n * 0.7)
+
+
+def synthetic_sample(i, n, rng, counters, t0):
+    """
+    构造一条与 MetricsCollector.collect_system_metrics 结构相同的样本。
+    攻击区间内连接数下降、CPU 升高；counters 为累计网络计数器，原地递增。
+    """
+    start, end = _attack_window(n)
+    attacked = start <= i < end
+    now = t0 + i * INTERVAL
+    counters['bytes_sent'] += rng.randint(2000, 60000) * (3 if attacked else 1)
+    counters['bytes_recv'] += rng.randint(2000, 60000)
+    counters['packets_sent'] += rng.randint(5, 80) * (3 if attacked else 1)
+    counters['packets_recv'] += rng.randint(5, 80)
+    established = max(0, int(rng.gauss(12 if attacked else 55, 3)))
+    time_wait = rng.randint(0, 8)
+    slow_ts = now - (i % 50) * INTERVAL  # 慢速层每 5 秒刷新一次
+    return {
+        'timestamp': now,
+        'datetime': datetime.fromtimestamp(now).isoformat(),
+        'cpu_percent': min(100.0, max(0.0, rng.gauss(65 if attacked else 20, 8))),
+        'memory_percent': 40 + 5 * (i / n) + rng.random(),
+        'memory_mb': 1600 + 200 * (i / n) + rng.random() * 10,
+        'disk_io': {'read_count': i, 'write_count': 2 * i, 'read_bytes': 4096 * i,
+                    'write_bytes': 8192 * i, 'read_time': i, 'write_time': i},
+        'network_io': dict(counters, errin=0, errout=0, dropin=0, dropout=0),
+        'connections': {'total': established + time_wait + 4, 'established': established,
+                        'listen': 4, 'time_wait': time_wait, 'close_wait': 0, 'other': 0},
+        'connections_timestamp': slow_ts,
+        'processes': [{'pid': 100 + k, 'name': f'proc{k}', 'cpu_percent': 10.0 - k,
+                       'memory_percent': 1.0} for k in range(3)],
+        'processes_timestamp': slow_ts,
+        'load_average': [1.0, 0.8, 0.5],
+        # 慢速层运行的那个样本里采集器开销明显偏高
+        'collector': {'cpu_percent': rng.uniform(0.05, 0.3) + (1.5 if i % 50 == 0 else 0.0),
+                      'core_percent': rng.uniform(0.2, 1.2), 'fast_ms': rng.uniform(0.2, 0.8),
+                      'probe_ms': {'cpu': 0.05, 'memory': 0.05, 'disk_io': 0.1, 'network_io': 0.1,
+                                   'connections': 3.0, 'processes': 40.0},
+                      'throttle': 0},
+    }
+
+
+def generate(data_dir, samples, seed=0, monitor_ratio=0.5, trials_per_1k=10):
+    """
+    生成一个规模的合成数据，目录结构:
+      jsonl/  system_metrics.jsonl + connection_monitor.json + attack_statistics.json
+      store/  system_metrics.bin + 指向 jsonl/ 中其余文件的符号链接
+      eval/   summary.json + evidence.sqlite（结果与证据在归档中，与 eval_scheduler 一致）
+    参数相同的数据已存在时直接复用。
+    """
+    params = {'version': GENERATOR_VERSION, 'samples': samples, 'seed': seed,
+              'monitor_ratio': monitor_ratio, 'trials_per_1k': trials_per_1k}
+    meta_path = os.path.join(data_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            if json.load(f) == params:
+                return False
+
+    jsonl_dir = os.path.join(data_dir, 'jsonl')
+    store_dir = os.path.join(data_dir, 'store')
+    eval_dir = os.path.join(data_dir, 'eval')
+    for d in (jsonl_dir, store_dir, eval_dir):
+        os.makedirs(d, exist_ok=True)
+    store_path = os.path.join(store_dir, 'system_metrics.bin')
+    if os.path.exists(store_path):
+        os.remove(store_path)
+
+    rng = random.Random(seed)
+    t0 = 1700000000.0
+    counters = {'bytes_sent': 0, 'bytes_recv': 0, 'packets_sent': 0, 'packets_recv': 0}
+    written = {}
+    with open(os.path.join(jsonl_dir, 'system_metrics.jsonl'), 'w') as f, \
+            MetricsStoreWriter(store_path, batch_size=4096) as store:
+        for i in range(samples):
+            sample = synthetic_sample(i, samples, rng, counters, t0)
+            # 与 jsonl_interval=0 的采集器相同：逐条写出，慢速层字段只在刷新时写出
+            f.write(json.dumps(thin_sample(sample, written)) + '\n')
+            store.append(sample)
+
+    # 连接监控: 攻击区间内大部分探测失败或超时
+    start, end = _attack_window(samples)
+    records = max(1, int(samples * monitor_ratio))
+    step = samples * INTERVAL / records
+    with open(os.path.join(jsonl_dir, 'connection_monitor.json'), 'w') as f:
+        f.write('[\n')
+        for k in range(records):
+            ts = t0 + k * step
+            service, port = MONITOR_PORTS[k % len(MONITOR_PORTS)]
+            attacked = start * INTERVAL <= ts - t0 < end * INTERVAL
+            roll = rng.random()
+            status = ('正常' if roll > (0.8 if attacked else 0.02)
+                      else ('超时' if roll < 0.3 else '失败'))
+            f.write(json.dumps({
+                'timestamp': ts, 'service': service, 'port': port,
+                'conn_id': f'{service}:{k % 4}', 'event': 'heartbeat', 'status': status,
+                'latency_ms': rng.uniform(0.2, 3.0) if status == '正常' else None,
+            }, ensure_ascii=False))
+            f.write(',\n' if k + 1 < records else '\n')
+        f.write(']\n')
+
+    with open(os.path.join(jsonl_dir, 'attack_statistics.json'), 'w') as f:
+        json.dump({
+            'attack_info': {'nat_ip': '10.0.0.2', 'server_ip': '10.0.0.10',
+                            'target_ports_range': [32768, 60999],
+                            'start_time': t0 + start * INTERVAL, 'end_time': t0 + end * INTERVAL,
+                            'duration': (end - start) * INTERVAL},
+            'packets': {'rst_packets_sent': samples * 4, 'push_ack_packets_sent': samples * 4,
+                        'total_packets': samples * 8},
+        }, f, indent=2)
+    for name in ('connection_monitor.json', 'attack_statistics.json'):
+        link = os.path.join(store_dir, name)
+        if not os.path.lexists(link):
+            os.symlink(os.path.join('..', 'jsonl', name), link)
+
+    # 评估运行：与 eval_scheduler 的输出一致，summary.json 不内嵌结果，
+    # TrialResult 与 conntrack 证据写入 evidence.sqlite
+    archive_path = os.path.join(eval_dir, 'evidence.sqlite')
+    if os.path.exists(archive_path):
+        os.remove(archive_path)
+    environments = ['ubuntu20.04-0', 'ubuntu18.04-1']
+    background = [f'tcp 6 {rng.randint(100, 431999)} ESTABLISHED src=192.168.1.{rng.randint(3, 99)} '
+                  f'dst=10.0.0.{rng.randint(20, 99)} sport={rng.randint(32768, 60999)} dport=80'
+                  for _ in range(50)]
+    trials = max(10, samples * trials_per_1k // 1000)
+    archive = EvidenceArchive(archive_path)
+    success = 0
+    try:
+        for k in range(trials):
+            environment = environments[k % len(environments)]
+            trial_id = k // len(environments) + 1
+            ts = t0 + k * 5.0
+            observed = rng.random() < 0.7
+            sport = 40000 + k % 20000
+            flow_row = f'tcp 6 431999 ESTABLISHED src=192.168.1.100 dst=10.0.0.10 sport={sport} dport=5003'
+            before = '\n'.join(background + [flow_row]) + '\n'
+            after = '\n'.join(background + ([] if observed else [flow_row])) + '\n'
+            ref = os.path.basename(archive.path) + '#' + EvidenceArchive.ref(trial_id, environment)
+            teardown = rng.uniform(0.05, 2.0) if observed else None
+            archive.put_trial({
+                'trial_id': trial_id, 'start_ts': ts, 'end_ts': ts + 3.0,
+                'before_conntrack': ref + ':before', 'after_conntrack': ref + ':after',
+                'flow_state_before': 'ESTABLISHED', 'flow_state_after': None if observed else 'ESTABLISHED',
+                'dos_observed': observed, 'notes': '', 'mode': 'event',
+                'transitions': ([{'ts': ts + 1.0, 'type': 'UPDATE', 'state': 'ESTABLISHED', 'sport': sport},
+                                 {'ts': ts + 1.0 + teardown, 'type': 'DESTROY', 'state': None, 'sport': sport}]
+                                if observed else []),
+                'time_to_teardown': teardown, 'environment': environment,
+            }, before, after, environment)
+            success += observed
+    finally:
+        archive.close()
+    with open(os.path.join(eval_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump({'trials': trials, 'success': success, 'success_rate': success / trials,
+                   'evidence_archive': os.path.basename(archive_path)}, f)
+
+    with open(meta_path, 'w') as f:
+        json.dump(params, f)
+    return True
+
+
+def _sample_pool(samples, seed):
+    rng = random.Random(seed + 1)
+    counters = {'bytes_sent': 0, 'bytes_recv': 0, 'packets_sent': 0, 'packets_recv': 0}
+    n = min(samples, SAMPLE_POOL)
+    return [synthetic_sample(i * max(1, samples // n), samples, rng, counters, 1700000000.0)
+            for i in range(n)]
+
+
+def stage_collector(data_dir, scratch, samples, pool, **_):
+    from metrics_collector import MetricsCollector
+
+    collector = MetricsCollector(os.path.join(scratch, 'system_metrics.jsonl'),
+                                 store_file=os.path.join(scratch, 'system_metrics.bin'))
+    if os.path.exists(collector.store_file):
+        os.remove(collector.store_file)
+    collector.open_outputs()
+    try:
+        record = collector.record_sample
+        size = len(pool)
+        for i in range(samples):
+            record(dict(pool[i % size], timestamp=1700000000.0 + i * INTERVAL))
+    finally:
+        collector.close_outputs()
+    return collector.generate_summary()['cpu_stats']
+
+
+def stage_effect(data_dir, scratch, samples, **_):
+    from metrics_collector import AttackEffectAnalyzer
+
+    analyzer = AttackEffectAnalyzer(os.path.join(data_dir, 'jsonl', 'system_metrics.jsonl'))
+    analyzer.load_data()
+    analysis = analyzer.analyze_attack_effect()
+    analyzer.generate_timeline()
+    return analysis['attack_detected']
+
+
+def stage_summary(data_dir, scratch, samples, source='store', **_):
+    from analyze_results import summarize_output
+
+    return summarize_output(os.path.join(data_dir, source))['total_data_points']
+
+
+def stage_analyzer(data_dir, scratch, samples, source='store', render=False, **_):
+    from analyze_results import ReDANAnalyzer
+
+    output_dir = os.path.join(data_dir, source)
+    analyzer = ReDANAnalyzer(output_dir)
+    analyzer.load_data()
+    analyzer.analyze_system_performance()
+    analyzer.analyze_attack_effectiveness()
+    analyzer.analyze_network_traffic()
+    analyzer.generate_attack_timeline()
+    if render:
+        # 清掉图表缓存，保证每轮都真正渲染
+        from report_render import CACHE_FILE
+        cache = os.path.join(output_dir, CACHE_FILE)
+        if os.path.exists(cache):
+            os.remove(cache)
+        analyzer.render_figures()
+    return len(analyzer.metrics_df)
+
+
+def stage_runs(data_dir, scratch, samples, **_):
+    from run_stats import RunAggregator
+
+    aggregator = RunAggregator()
+    aggregator.add_run(os.path.join(data_dir, 'eval'))
+    return aggregator.aggregate()['trials']
+
+
+# 各阶段用到的模块，计时前先导入，避免首轮计入 pandas / matplotlib 的导入时间
+STAGE_MODULES = {
+    'collector': ['metrics_collector'],
+    'effect': ['metrics_collector', 'run_stats'],
+    'summary': ['analyze_results'],
+    'analyzer': ['analyze_results', 'pandas', 'series_agg', 'report_render'],
+    'runs': ['run_stats', 'evidence_archive'],
+}
+
+STAGE_FUNCS = {
+    'collector': stage_collector,
+    'effect': stage_effect,
+    'summary': stage_summary,
+    'analyzer': stage_analyzer,
+    'runs': stage_runs,
+}
+
+
+def _quiet(func, *args, **kwargs):
+    """被测代码的进度输出不混入基准结果"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def measure(func, kwargs, repeat=3, memory=True):
+    """多轮计时取最佳值；峰值内存在单独一轮中用 tracemalloc 测量"""
+    wall, cpu = [], []
+    for _ in range(repeat):
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        _quiet(func, **kwargs)
+        wall.append(time.perf_counter() - start_wall)
+        cpu.append(time.process_time() - start_cpu)
+    best = min(range(repeat), key=wall.__getitem__)
+    result = {
+        'best_seconds': wall[best],
+        'median_seconds': sorted(wall)[repeat // 2],
+        'cpu_seconds': cpu[best],
+        'peak_mb': None,
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            _quiet(func, **kwargs)
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def profile(func, kwargs, profiler, path):
+    """在单独一轮中运行 cProfile 或 pyinstrument，结果写入 path.*"""
+    if profiler == 'cprofile':
+        import cProfile
+        import pstats
+
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            _quiet(func, **kwargs)
+        finally:
+            prof.disable()
+        prof.dump_stats(path + '.prof')
+        with open(path + '.txt', 'w') as f:
+            pstats.Stats(prof, stream=f).sort_stats('cumulative').print_stats(40)
+        return path + '.prof'
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        raise SystemExit("pyinstrument is not installed (pip install pyinstrument)")
+    prof = Profiler()
+    prof.start()
+    try:
+        _quiet(func, **kwargs)
+    finally:
+        prof.stop()
+    with open(path + '.html', 'w') as f:
+        f.write(prof.output_html())
+    with open(path + '.txt', 'w') as f:
+        f.write(prof.output_text())
+    return path + '.html'
+
+
+def code_version():
+    try:
+        out = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=SCRIPT_DIR,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=10)
+        if out.returncode == 0 and out.stdout.strip():
+            return out.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return 'unknown'
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_baseline(history, version, baseline=None):
+    """baseline 为空时取最近一次与当前版本不同的运行"""
+    for entry in reversed(history):
+        if baseline is not None:
+            if entry['version'] == baseline or entry.get('label') == baseline:
+                return entry
+        elif entry['version'] != version:
+            return entry
+    return None
+
+
+def find_regressions(results, baseline, threshold=0.2, min_seconds=0.01):
+    """耗时 / 峰值内存相对基线增长超过 threshold 的项；耗时差小于 min_seconds 的忽略（计时噪声）"""
+    ref = {(r['stage'], r['samples']): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        old = ref.get((r['stage'], r['samples']))
+        if old is None:
+            continue
+        if (r['best_seconds'] > old['best_seconds'] * (1 + threshold)
+                and r['best_seconds'] - old['best_seconds'] >= min_seconds):
+            regressions.append({'stage': r['stage'], 'samples': r['samples'], 'metric': 'best_seconds',
+                                'before': old['best_seconds'], 'after': r['best_seconds']})
+        if (r['peak_mb'] is not None and old.get('peak_mb')
+                and r['peak_mb'] > old['peak_mb'] * (1 + threshold)):
+            regressions.append({'stage': r['stage'], 'samples': r['samples'], 'metric': 'peak_mb',
+                                'before': old['peak_mb'], 'after': r['peak_mb']})
+    return regressions
+
+
+def print_table(results, baseline=None):
+    ref = {(r['stage'], r['samples']): r for r in baseline['results']} if baseline else {}
+
+    def fmt(v, spec):
+        return 'n/a' if v is None else format(v, spec)
+
+    print(f"\n{'stage':<18}{'samples':>10}{'best s':>10}{'cpu s':>10}{'us/sample':>11}"
+          f"{'peak MB':>10}{'Δtime%':>9}")
+    for r in results:
+        old = ref.get((r['stage'], r['samples']))
+        change = (r['best_seconds'] / old['best_seconds'] - 1) * 100 if old and old['best_seconds'] else None
+        print(f"{r['stage']:<18}{r['samples']:>10}{r['best_seconds']:>10.3f}{r['cpu_seconds']:>10.3f}"
+              f"{r['best_seconds'] / r['samples'] * 1e6:>11.2f}{fmt(r['peak_mb'], '.1f'):>10}"
+              f"{fmt(change, '+.1f'):>9}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on synthetic data")
+    parser.add_argument('--sizes', default='1e3,1e4,1e5', help='comma-separated sample counts (1e3 .. 1e7)')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"subset of: {', '.join(STAGES)}")
+    parser.add_argument('--sources', default=','.join(SOURCES),
+                        help='metric sources for summary/analyzer stages: jsonl, store')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage (best is reported)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--render', action='store_true', help='also render figures in the analyzer stage')
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'], default=None)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'redan_pipeline_bench'),
+                        help='synthetic data cache (reused when parameters match)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--monitor-ratio', type=float, default=0.5,
+                        help='connection_monitor records per metrics sample')
+    parser.add_argument('--history', default='./output/bench/pipeline_history.jsonl')
+    parser.add_argument('--label', default=None, help='free-form tag stored with this run')
+    parser.add_argument('--baseline', default=None, help='version or label to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative increase flagged as regression')
+    parser.add_argument('--no-save', action='store_true', help='do not append to the history file')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 2 on regressions')
+    args = parser.parse_args(argv)
+    args.sizes = [_parse_size(s) for s in args.sizes.split(',') if s]
+    args.stages = [s for s in args.stages.split(',') if s]
+    args.sources = [s for s in args.sources.split(',') if s]
+    unknown = set(args.stages) - set(STAGES) or set(args.sources) - set(SOURCES)
+    if unknown:
+        parser.error(f"unknown stage/source: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    version = code_version()
+    history_dir = os.path.dirname(os.path.abspath(args.history))
+    profile_dir = os.path.join(history_dir, 'profiles')
+
+    for stage in args.stages:
+        for module in STAGE_MODULES[stage]:
+            importlib.import_module(module)
+
+    results = []
+    for samples in args.sizes:
+        data_dir = os.path.join(args.data_dir, str(samples))
+        start = time.perf_counter()
+        if generate(data_dir, samples, args.seed, args.monitor_ratio):
+            print(f"[*] 生成 {samples} 个样本的合成数据: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        pool = _sample_pool(samples, args.seed) if 'collector' in args.stages else None
+
+        with tempfile.TemporaryDirectory(prefix='pipeline_bench_') as scratch:
+            for stage in args.stages:
+                sources = args.sources if stage in ('summary', 'analyzer') else [None]
+                for source in sources:
+                    name = f"{stage}/{source}" if source else stage
+                    kwargs = {'data_dir': data_dir, 'scratch': scratch, 'samples': samples,
+                              'pool': pool, 'render': args.render}
+                    if source:
+                        kwargs['source'] = source
+                    result = measure(STAGE_FUNCS[stage], kwargs, args.repeat, not args.no_memory)
+                    result.update({'stage': name, 'samples': samples})
+                    if args.profile:
+                        os.makedirs(profile_dir, exist_ok=True)
+                        path = os.path.join(profile_dir, f"{name.replace('/', '_')}_{samples}")
+                        result['profile'] = profile(STAGE_FUNCS[stage], kwargs, args.profile, path)
+                    results.append(result)
+                    print(f"[*] {name:<18} n={samples:<10} {result['best_seconds']:.3f}s", file=sys.stderr)
+
+    history = load_history(args.history)
+    baseline = find_baseline(history, version, args.baseline)
+    print_table(results, baseline)
+
+    regressions = find_regressions(results, baseline, args.threshold) if baseline else []
+    if baseline is None:
+        print("\n[*] 历史中没有可比较的基线版本")
+    elif regressions:
+        print(f"\n[!] 相对 {baseline['version']} 的回退:")
+        for r in regressions:
+            print(f"    {r['stage']:<18} n={r['samples']:<10} {r['metric']}: "
+                  f"{r['before']:.3f} -> {r['after']:.3f} ({(r['after'] / r['before'] - 1) * 100:+.0f}%)")
+    else:
+        print(f"\n[+] 相对 {baseline['version']} 没有超过 {args.threshold * 100:.0f}% 的回退")
+
+    if not args.no_save:
+        os.makedirs(history_dir, exist_ok=True)
+        entry = {
+            'timestamp': datetime.now().isoformat(),
+            'version': version,
+            'label': args.label,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'baseline': baseline['version'] if baseline else None,
+            'results': results,
+            'regressions': regressions,
+        }
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+        print(f"[*] 结果已追加到 {args.history}", file=sys.stderr)
+
+    if regressions and args.fail_on_regression:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+分析报告图表渲染
+- 字体列表只计算一次，不再强制重建matplotlib字体缓存
+- 各图表以纯函数实现，可在进程池中并行渲染
+- 以输入数据哈希作为缓存键，数据未变化时跳过重绘
+- 输入为 series_agg 预先聚合/降采样后的数据，点数与实验时长无关
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+from matplotlib import font_manager as fm
+
+# 修改任何渲染函数的输出时递增，使旧缓存失效
+RENDER_VERSION = 2
+CACHE_FILE = '.figure_cache.json'
+
+_style_ready = False
+
+
+def setup_style():
+    """设置中文字体与图表样式（每个进程只执行一次）"""
+    global _style_ready
+    if _style_ready:
+        return
+    # fontManager 首次访问时从matplotlib的磁盘缓存加载，无需重新扫描系统字体
+    cjk_list = ['CJK', 'Han', 'CN', 'TW', 'JP']
+    cjk_fonts = [f.name for f in fm.fontManager.ttflist if any(s.lower() in f.name.lower() for s in cjk_list)]
+    plt.style.use('seaborn-v0_8')
+    sns.set_palette("husl")
+    plt.rcParams['font.family'] = ['DejaVu Sans'] + cjk_fonts
+    plt.rcParams['axes.unicode_minus'] = False
+    _style_ready = True
+
+
+def _plot_band(ax, x, df, name, color, label):
+    """绘制窗口均值曲线，并以 min~max 包络显示窗口内的波动"""
+    ax.plot(x, df[name], color=color, linewidth=1.5, label=label)
+    if f'{name}.min' in df:
+        ax.fill_between(x, df[f'{name}.min'], df[f'{name}.max'], color=color, alpha=0.2, linewidth=0)
+
+
+def render_system_performance(path, df):
+    """系统性能影响图表（df 为窗口聚合结果）"""
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle('ReDAN攻击对系统性能的影响分析', fontsize=16, fontweight='bold')
+
+    # CPU使用率
+    _plot_band(axes[0, 0], df['datetime'], df, 'cpu_percent', 'red', 'CPU使用率')
+    axes[0, 0].set_title('CPU使用率变化', fontweight='bold')
+    axes[0, 0].set_ylabel('CPU使用率 (%)')
+    axes[0, 0].grid(True, alpha=0.3)
+    axes[0, 0].legend()
+
+    # 内存使用率
+    _plot_band(axes[0, 1], df['datetime'], df, 'memory_percent', 'blue', '内存使用率')
+    axes[0, 1].set_title('内存使用率变化', fontweight='bold')
+    axes[0, 1].set_ylabel('内存使用率 (%)')
+    axes[0, 1].grid(True, alpha=0.3)
+    axes[0, 1].legend()
+
+    # 网络连接数
+    _plot_band(axes[1, 0], df['datetime'], df, 'connections.total', 'green', '总连接数')
+    axes[1, 0].set_title('网络连接数变化', fontweight='bold')
+    axes[1, 0].set_ylabel('连接数')
+    axes[1, 0].grid(True, alpha=0.3)
+    axes[1, 0].legend()
+
+    # 网络流量
+    axes[1, 1].plot(df['datetime'], df['network_io.bytes_sent'], 'orange', linewidth=2, label='发送字节数')
+    axes[1, 1].plot(df['datetime'], df['network_io.bytes_recv'], 'purple', linewidth=2, label='接收字节数')
+    axes[1, 1].set_title('网络流量变化', fontweight='bold')
+    axes[1, 1].set_ylabel('字节数')
+    axes[1, 1].grid(True, alpha=0.3)
+    axes[1, 1].legend()
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def render_attack_effectiveness(path, df_connections):
+    """
+    不同服务连接受影响情况图表
+    df_connections 为按端口窗口聚合后的数据: timestamp, port, ok_rate（窗口内正常比例）, success_rate（整体成功率）
+    """
+    ports = df_connections['port'].unique()
+
+    fig, axes = plt.subplots(len(ports), 1, figsize=(15, 4*len(ports)))
+    if len(ports) == 1:
+        axes = [axes]
+
+    fig.suptitle('ReDAN攻击对不同服务连接的影响', fontsize=16, fontweight='bold')
+
+    for i, port in enumerate(ports):
+        port_data = df_connections[df_connections['port'] == port]
+        success_rate = port_data['success_rate'].iloc[0] * 100
+
+        # 绘制连接状态时间线（窗口内正常的比例，1 为全部正常）
+        axes[i].plot(port_data['timestamp'], port_data['ok_rate'], 'b-', linewidth=2,
+                    label=f'端口 {port} (成功率: {success_rate:.1f}%)')
+        axes[i].set_ylabel('连接状态')
+        axes[i].set_ylim(-0.1, 1.1)
+        axes[i].grid(True, alpha=0.3)
+        axes[i].legend()
+
+        # 添加攻击时间段标记（假设攻击在中间时段）
+        mid_time = port_data['timestamp'].iloc[len(port_data)//2]
+        axes[i].axvline(x=mid_time, color='red', linestyle='--', alpha=0.7, label='攻击时段')
+
+    axes[-1].set_xlabel('时间')
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def render_network_traffic(path, df_traffic, df_rates):
+    """
+    网络流量模式图表
+    df_traffic: LTTB 降采样后的累计流量；df_rates: 窗口聚合后的每秒速率（均值与包络）
+    """
+    fig, axes = plt.subplots(2, 1, figsize=(15, 10))
+    fig.suptitle('网络流量模式分析', fontsize=16, fontweight='bold')
+
+    # 累积流量
+    axes[0].plot(df_traffic['datetime'], df_traffic['network_io.bytes_sent'] / (1024*1024), 'r-',
+                linewidth=2, label='发送流量 (MB)')
+    axes[0].plot(df_traffic['datetime'], df_traffic['network_io.bytes_recv'] / (1024*1024), 'b-',
+                linewidth=2, label='接收流量 (MB)')
+    axes[0].set_title('累积网络流量', fontweight='bold')
+    axes[0].set_ylabel('流量 (MB)')
+    axes[0].grid(True, alpha=0.3)
+    axes[0].legend()
+
+    # 流量速率
+    rates = df_rates[['datetime']].copy()
+    for name in ('network_io.bytes_sent.rate', 'network_io.bytes_recv.rate'):
+        for suffix in ('', '.min', '.max'):
+            rates[name + suffix] = df_rates[name + suffix] / 1024
+    _plot_band(axes[1], rates['datetime'], rates, 'network_io.bytes_sent.rate', 'orange', '发送速率 (KB/s)')
+    _plot_band(axes[1], rates['datetime'], rates, 'network_io.bytes_recv.rate', 'purple', '接收速率 (KB/s)')
+    axes[1].set_title('网络流量速率', fontweight='bold')
+    axes[1].set_ylabel('速率 (KB/s)')
+    axes[1].set_xlabel('时间')
+    axes[1].grid(True, alpha=0.3)
+    axes[1].legend()
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def render_attack_timeline(path, df, attack_info):
+    """攻击时间线图表（df 为窗口聚合结果，使用窗口均值）"""
+    fig, ax = plt.subplots(1, 1, figsize=(15, 8))
+
+    # 标准化数据以便在同一图表上显示
+    connection_counts = df['connections.total']
+    cpu_normalized = (df['cpu_percent'] - df['cpu_percent'].min()) / (df['cpu_percent'].max() - df['cpu_percent'].min())
+    memory_normalized = (df['memory_percent'] - df['memory_percent'].min()) / (df['memory_percent'].max() - df['memory_percent'].min())
+    connections_normalized = (connection_counts - connection_counts.min()) / (connection_counts.max() - connection_counts.min())
+
+    ax.plot(df['datetime'], cpu_normalized, 'r-', linewidth=2, label='CPU使用率 (标准化)')
+    ax.plot(df['datetime'], memory_normalized, 'b-', linewidth=2, label='内存使用率 (标准化)')
+    ax.plot(df['datetime'], connections_normalized, 'g-', linewidth=2, label='连接数 (标准化)')
+
+    # 标记攻击时间段
+    if attack_info:
+        start_time = pd.to_datetime(attack_info['start_time'], unit='s')
+        end_time = pd.to_datetime(attack_info['end_time'], unit='s')
+
+        ax.axvspan(start_time, end_time, alpha=0.3, color='red', label='攻击时段')
+
+    ax.set_title('ReDAN攻击时间线分析', fontsize=16, fontweight='bold')
+    ax.set_ylabel('标准化指标值')
+    ax.set_xlabel('时间')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def data_hash(func, args):
+    """计算渲染函数与输入数据的哈希，作为缓存键"""
+    h = hashlib.sha256(f"{RENDER_VERSION}:{func.__name__}".encode())
+    for arg in args:
+        if isinstance(arg, pd.DataFrame):
+            h.update(','.join(map(str, arg.columns)).encode())
+            h.update(pd.util.hash_pandas_object(arg, index=True).values.tobytes())
+        else:
+            h.update(json.dumps(arg, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _render_job(func, path, args):
+    setup_style()
+    func(path, *args)
+    return path
+
+
+class FigureRenderer:
+    """收集待渲染图表，跳过未变化的图表，其余并行渲染"""
+
+    def __init__(self, output_dir, workers=None):
+        self.output_dir = output_dir
+        self.workers = workers if workers is not None else min(4, os.cpu_count() or 1)
+        self.cache_path = os.path.join(output_dir, CACHE_FILE)
+        self.jobs = []
+
+    def add(self, filename, func, *args):
+        self.jobs.append((filename, func, args))
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def render(self):
+        """渲染所有排队的图表，返回 {文件名: 'rendered'|'cached'}"""
+        cache = self._load_cache()
+        status = {}
+        stale = []
+        for filename, func, args in self.jobs:
+            key = data_hash(func, args)
+            path = os.path.join(self.output_dir, filename)
+            if cache.get(filename) == key and os.path.exists(path):
+                status[filename] = 'cached'
+            else:
+                stale.append((filename, key, func, path, args))
+        self.jobs = []
+
+        if len(stale) > 1 and self.workers > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(stale))) as pool:
+                futures = [pool.submit(_render_job, func, path, args)
+                           for _, _, func, path, args in stale]
+                for future in futures:
+                    future.result()
+        else:
+            for _, _, func, path, args in stale:
+                _render_job(func, path, args)
+
+        for filename, key, _, _, _ in stale:
+            cache[filename] = key
+            status[filename] = 'rendered'
+        with open(self.cache_path, 'w') as f:
+            json.dump(cache, f, indent=2)
+        return status
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+跨运行的统计汇总
+- 成功率的 Wilson 置信区间，以及基于 bootstrap 的区间估计
+- time-to-teardown 等时间分布的分位数摘要
+- 连接数序列的变点检测（二分分割，均值漂移代价由累积和向量化计算）
+- RunAggregator 按运行增量汇总，并把每个运行的摘要缓存到磁盘，
+  新增一个运行时只需读取该运行本身
+"""
+
+import argparse
+import json
+import math
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+from evidence_archive import EvidenceArchive
+
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """二项比例的 Wilson 置信区间"""
+    if trials <= 0:
+        return 0.0, 0.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / trials
+    denom = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denom
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def bootstrap_ci(values, statistic=np.mean, n_boot=5000, confidence=0.95, seed=0):
+    """
+    百分位 bootstrap 置信区间；statistic 需支持 axis 参数（np.mean / np.median 等），
+    所有重采样在一个 (n_boot, n) 矩阵上一次算完。
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return math.nan, math.nan
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, values.size, size=(n_boot, values.size))
+    stats = statistic(values[idx], axis=1)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(stats, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def distribution_summary(values, confidence=0.95):
+    """时间分布摘要：分位数 + 中位数的 bootstrap 区间"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {'count': 0}
+    p5, p25, p50, p75, p95 = np.quantile(values, [0.05, 0.25, 0.5, 0.75, 0.95])
+    low, high = bootstrap_ci(values, np.median, confidence=confidence)
+    return {
+        'count': int(values.size),
+        'mean': float(values.mean()),
+        'min': float(values.min()),
+        'p5': float(p5),
+        'p25': float(p25),
+        'median': float(p50),
+        'p75': float(p75),
+        'p95': float(p95),
+        'max': float(values.max()),
+        'median_ci': [low, high],
+    }
+
+
+def _best_split(csum, start, end, min_size):
+    """在 [start, end) 内寻找使均值漂移代价下降最多的切分点"""
+    n = end - start
+    if n < 2 * min_size:
+        return None, 0.0
+    k = np.arange(start + min_size, end - min_size + 1)
+    total = csum[end] - csum[start]
+    left = csum[k] - csum[start]
+    right = total - left
+    nl = k - start
+    gain = left * left / nl + right * right / (n - nl) - total * total / n
+    best = int(np.argmax(gain))
+    return int(k[best]), float(gain[best])
+
+
+def noise_sigma(y, floor_fraction=0.02):
+    """
+    噪声标准差的稳健估计：一阶差分的 MAD，下限为序列量级（中位数绝对值）的 floor_fraction。
+    阶梯状 / 大量重复值的序列差分多为 0，MAD 会退化为 0，下限保证惩罚项不会随之坍缩。
+    """
+    y = np.asarray(y, dtype=float)
+    diffs = np.diff(y)
+    mad = 1.4826 * float(np.median(np.abs(diffs - np.median(diffs)))) / math.sqrt(2) if diffs.size else 0.0
+    scale = float(np.median(np.abs(y))) if y.size else 0.0
+    return max(mad, floor_fraction * scale, 1e-9)
+
+
+def change_points(series, min_size=5, penalty=None, max_points=10):
+    """
+    基于均值漂移的二分分割变点检测，返回升序的切分下标列表。
+    默认惩罚项为 3*log(n)*sigma^2，sigma 见 noise_sigma。
+    """
+    y = np.asarray(series, dtype=float)
+    y = y[~np.isnan(y)]
+    n = y.size
+    if n < 2 * min_size:
+        return []
+    if penalty is None:
+        sigma = noise_sigma(y)
+        penalty = 3 * math.log(n) * sigma * sigma
+    csum = np.concatenate(([0.0], np.cumsum(y)))
+
+    points = []
+    segments = [(0, n)]
+    while segments and len(points) < max_points:
+        candidates = [(_best_split(csum, s, e, min_size), (s, e)) for s, e in segments]
+        (split, gain), (s, e) = max(candidates, key=lambda c: c[0][1])
+        if split is None or gain <= penalty:
+            break
+        points.append(split)
+        segments.remove((s, e))
+        segments.extend([(s, split), (split, e)])
+    return sorted(points)
+
+
+def detect_drop(series, timestamps=None, min_size=5, refresh_timestamps=None, alpha=0.01):
+    """
+    在连接数序列中找到幅度最大的一次下降：返回下降前的基线（下降点之前全部样本的均值）、
+    下降后区段的均值、下降比例和发生时刻。
+
+    refresh_timestamps 为每个样本的实际刷新时间（connections_timestamp）。连接数只在慢速层
+    每 5 秒刷新一次，按 100 毫秒采样的序列大部分是重复值，先按刷新时间去重再分段。
+    下降需通过单侧 Welch 检验（方差下限为噪声方差）且幅度超过 3 倍噪声，否则返回 None；
+    没有向下的变点时同样返回 None。返回的下标与时刻均对应原始序列。
+    """
+    y = np.asarray(series, dtype=float)
+    index = np.arange(y.size)
+    refresh = None if refresh_timestamps is None else np.asarray(refresh_timestamps, dtype=float)
+    if refresh is not None and not np.isnan(refresh).all():
+        # 刷新时间与前一个样本相同的都是重复值；旧数据没有刷新时间时不去重
+        fresh = ~np.isnan(refresh) & ~np.isnan(y)
+        fresh[1:] &= refresh[1:] != refresh[:-1]
+        index = index[fresh]
+    else:
+        index = index[~np.isnan(y)]
+    values = y[index]
+
+    points = change_points(values, min_size=min_size)
+    if not points:
+        return None
+    bounds = np.array([0] + points + [values.size])
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    means = (csum[bounds[1:]] - csum[bounds[:-1]]) / np.diff(bounds)
+    drops = means[:-1] - means[1:]
+    i = int(np.argmax(drops))
+    if drops[i] <= 0:
+        return None
+
+    cp = points[i]
+    pre, post = values[:cp], values[cp:bounds[i + 2]]
+    sigma = noise_sigma(values)
+    se = math.sqrt(max(float(pre.var(ddof=1)), sigma * sigma) / pre.size
+                   + max(float(post.var(ddof=1)), sigma * sigma) / post.size)
+    before, after = float(pre.mean()), float(post.mean())
+    p_value = 1 - NormalDist().cdf((before - after) / se)
+    # 样本很多时微小的漂移也会“显著”，下降幅度还需超过 3 倍噪声
+    if before - after < 3 * sigma or p_value >= alpha:
+        return None
+
+    onset = int(index[cp])
+    result = {
+        'index': onset,
+        'baseline': before,
+        'after': after,
+        'drop': before - after,
+        'drop_percent': (before - after) / before * 100 if before > 0 else 0.0,
+        'p_value': p_value,
+        'change_points': [int(index[p]) for p in points],
+    }
+    if timestamps is not None:
+        ts = np.asarray(timestamps, dtype=float)
+        result['onset_ts'] = float(ts[onset])
+        result['time_to_effect'] = float(ts[onset] - ts[0])
+    return result
+
+
+def load_run(run_dir):
+    """读取一个评估运行（summary.json，结果缺失时从 evidence.sqlite 读取）"""
+    with open(os.path.join(run_dir, 'summary.json'), 'r', encoding='utf-8') as f:
+        summary = json.load(f)
+    results = summary.get('results')
+    if results is None and summary.get('evidence_archive'):
+        archive = EvidenceArchive(os.path.join(run_dir, summary['evidence_archive']))
+        try:
+            results = list(archive.iter_results())
+        finally:
+            archive.close()
+    return summary, results or []
+
+
+def summarize_run(run_dir):
+    """单个运行的紧凑摘要，是缓存的基本单位"""
+    summary, results = load_run(run_dir)
+    per_env = {}
+    for r in results:
+        env = per_env.setdefault(r.get('environment', ''), {'trials': 0, 'success': 0})
+        env['trials'] += 1
+        env['success'] += int(bool(r.get('dos_observed')))
+    ttt = [r['time_to_teardown'] for r in results if r.get('time_to_teardown') is not None]
+    return {
+        'trials': summary.get('trials', len(results)),
+        'success': summary.get('success', sum(int(bool(r.get('dos_observed'))) for r in results)),
+        'environments': per_env,
+        'time_to_teardown': ttt,
+    }
+
+
+class RunAggregator:
+    """
+    增量汇总多个运行。每个运行的摘要以路径为键缓存，并记录 summary.json 与证据归档
+    （*.sqlite）的 mtime / size；重新汇总时这些文件都未变化的运行直接使用缓存。
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self.cache = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                self.cache = json.load(f)
+        self.runs = {}
+
+    @staticmethod
+    def _run_key(run_dir):
+        # 结果可能只在 evidence.sqlite 中（load_run 从归档读取），追加 trial 不会改动 summary.json
+        parts = []
+        for name in ['summary.json'] + sorted(e.name for e in os.scandir(run_dir)
+                                              if e.name.endswith('.sqlite')):
+            st = os.stat(os.path.join(run_dir, name))
+            parts.append(f"{name}:{st.st_mtime_ns}:{st.st_size}")
+        return "|".join(parts)
+
+    def add_run(self, run_dir):
+        run_dir = os.path.abspath(run_dir)
+        key = self._run_key(run_dir)
+        cached = self.cache.get(run_dir)
+        if cached is None or cached['key'] != key:
+            cached = {'key': key, 'run': summarize_run(run_dir)}
+            self.cache[run_dir] = cached
+        self.runs[run_dir] = cached['run']
+
+    def save(self):
+        if self.cache_path:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f)
+
+    def aggregate(self, confidence=0.95):
+        runs = list(self.runs.values())
+        trials = np.array([r['trials'] for r in runs], dtype=float)
+        success = np.array([r['success'] for r in runs], dtype=float)
+        total_trials, total_success = int(trials.sum()), int(success.sum())
+        rates = success[trials > 0] / trials[trials > 0]
+        ttt = np.concatenate([np.asarray(r['time_to_teardown'], dtype=float) for r in runs]) if runs else np.array([])
+
+        per_env = {}
+        for r in runs:
+            for env, counts in r['environments'].items():
+                agg = per_env.setdefault(env, {'trials': 0, 'success': 0})
+                agg['trials'] += counts['trials']
+                agg['success'] += counts['success']
+        for env, agg in per_env.items():
+            agg['success_rate'] = agg['success'] / agg['trials'] if agg['trials'] else 0.0
+            agg['wilson_ci'] = list(wilson_interval(agg['success'], agg['trials'], confidence))
+
+        return {
+            'runs': len(runs),
+            'trials': total_trials,
+            'success': total_success,
+            'success_rate': total_success / total_trials if total_trials else 0.0,
+            'wilson_ci': list(wilson_interval(total_success, total_trials, confidence)),
+            'run_rate_bootstrap_ci': list(bootstrap_ci(rates, np.mean, confidence=confidence)) if rates.size else None,
+            'time_to_teardown': distribution_summary(ttt, confidence),
+            'environments': per_env,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate ReDAN evaluation runs with confidence intervals")
+    parser.add_argument('runs', nargs='+', help='run directories containing summary.json')
+    parser.add_argument('--cache', default=None, help='per-run summary cache (JSON)')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    args = parser.parse_args(argv)
+
+    aggregator = RunAggregator(args.cache)
+    for run_dir in args.runs:
+        aggregator.add_run(run_dir)
+    aggregator.save()
+    print(json.dumps(aggregator.aggregate(args.confidence), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+长时间序列的聚合与降采样（NumPy）
+- 固定时间窗口的 min / mean / max（NaN 安全，空窗口被丢弃）
+- 累计计数器转速率（每秒），计数器回绕/重置时按重新从 0 计数处理
+- LTTB（Largest-Triangle-Three-Buckets）保形降采样
+绘图只使用这些结果，点数与实验时长无关。
+"""
+
+import numpy as np
+
+
+def window_aggregate(t, columns, n_windows):
+    """
+    把 [t[0], t[-1]] 等分为 n_windows 个时间窗口，对每列计算窗口内的 min/mean/max。
+    t 需按时间升序；样本数不超过 n_windows 时原样返回（min=mean=max）。
+    返回 {'t': 窗口内样本的平均时间, 列名: (min, mean, max)}
+    """
+    t = np.asarray(t, dtype=float)
+    values = {name: np.asarray(v, dtype=float) for name, v in columns.items()}
+    if t.size <= n_windows:
+        return dict({'t': t}, **{name: (v, v, v) for name, v in values.items()})
+
+    edges = np.linspace(t[0], t[-1], n_windows + 1)
+    starts = np.searchsorted(t, edges[:-1], side='left')
+    counts = np.diff(np.append(starts, t.size))
+    starts = starts[counts > 0]
+    counts = counts[counts > 0]
+
+    result = {'t': np.add.reduceat(t, starts) / counts}
+    for name, v in values.items():
+        valid = ~np.isnan(v)
+        n_valid = np.add.reduceat(valid.astype(np.int64), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.add.reduceat(np.where(valid, v, 0.0), starts) / n_valid
+        # fmin/fmax 忽略 NaN；整窗都是 NaN 时结果仍为 NaN
+        result[name] = (np.fmin.reduceat(v, starts), mean, np.fmax.reduceat(v, starts))
+    return result
+
+
+def counter_rate(t, counter):
+    """累计计数器的每秒速率；首个样本为 0，计数器变小视为重置（增量取重置后的当前值）"""
+    t = np.asarray(t, dtype=float)
+    c = np.asarray(counter, dtype=float)
+    rate = np.zeros(c.size)
+    if c.size < 2:
+        return rate
+    dc = np.diff(c)
+    reset = dc < 0
+    dc[reset] = c[1:][reset]
+    dt = np.diff(t)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate[1:] = np.where(dt > 0, dc / dt, np.nan)
+    return rate
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回选中样本的下标（含首尾）。
+    每个桶内的三角形面积计算是向量化的，循环次数只与 n_out 有关。
+    n_out 小于 3 时按 3 处理（首、尾加一个中间点），输出点数始终有界。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = x.size
+    n_out = max(int(n_out), 3)
+    if n_out >= n:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end >= next_end:
+            # 最后一个桶：下一桶即末尾样本
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            avg_x, avg_y = x[end:next_end].mean(), np.nanmean(y[end:next_end])
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y - y[a]))
+        area = np.nan_to_num(area, nan=-1.0)
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
@@ -2,6 +2,7 @@
 server.py
 Server script to handle initial connections, NAT detection, and DoS attack tests.
 """
+import os
 import socket
 import threading
 import random
@@ -9,7 +10,7 @@ import subprocess
 import time 
 from scapy.all import sniff, IP, ICMP, TCP, send, sr1
 
-server_ip = "10.0.0.10"
+server_ip = os.environ.get("SERVER_IP", "10.0.0.10")
 initial_port = 5001
 detection_port = 5002
 dos_port = 5003
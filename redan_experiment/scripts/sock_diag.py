@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+套接字状态计数
+直接从内核获取按状态汇总的连接数，避免为每个套接字构造psutil对象:
+  1) sock_diag/inet_diag netlink 批量转储
+  2) 读取 /proc/net/{tcp,tcp6,udp,udp6}
+返回值与 MetricsCollector.get_network_connections 的 connection_summary 相同。
+"""
+
+import os
+import socket
+import struct
+
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+# nlmsghdr: len, type, flags, seq, pid
+NLMSG_HDR = struct.Struct('=IHHII')
+# inet_diag_req_v2: family, protocol, ext, pad, states, inet_diag_sockid(48B)
+INET_DIAG_REQ_V2 = struct.Struct('=BBBBI48s')
+
+# 内核 TCP 状态编号 (include/net/tcp_states.h)
+TCP_STATES = {
+    1: 'ESTABLISHED', 2: 'SYN_SENT', 3: 'SYN_RECV', 4: 'FIN_WAIT1',
+    5: 'FIN_WAIT2', 6: 'TIME_WAIT', 7: 'CLOSE', 8: 'CLOSE_WAIT',
+    9: 'LAST_ACK', 10: 'LISTEN', 11: 'CLOSING',
+}
+
+# 与 psutil.net_connections(kind='inet') 覆盖相同的套接字类型
+PROTOCOLS = (
+    (socket.AF_INET, socket.IPPROTO_TCP, 'tcp'),
+    (socket.AF_INET6, socket.IPPROTO_TCP, 'tcp6'),
+    (socket.AF_INET, socket.IPPROTO_UDP, 'udp'),
+    (socket.AF_INET6, socket.IPPROTO_UDP, 'udp6'),
+)
+
+
+def empty_summary():
+    return {
+        'total': 0,
+        'established': 0,
+        'listen': 0,
+        'time_wait': 0,
+        'close_wait': 0,
+        'other': 0
+    }
+
+
+def _add_state(summary, state, count=1):
+    """按 connection_summary 的分类累加；UDP 传入 None，与psutil的'NONE'一样计入other"""
+    summary['total'] += count
+    if state == 'ESTABLISHED':
+        summary['established'] += count
+    elif state == 'LISTEN':
+        summary['listen'] += count
+    elif state == 'TIME_WAIT':
+        summary['time_wait'] += count
+    elif state == 'CLOSE_WAIT':
+        summary['close_wait'] += count
+    else:
+        summary['other'] += count
+
+
+def _dump_state_counts(sock, family, protocol, seq):
+    """对一个 (family, protocol) 发起 inet_diag 转储，返回 {状态号: 数量}"""
+    payload = INET_DIAG_REQ_V2.pack(family, protocol, 0, 0, 0xffffffff, b'\0' * 48)
+    header = NLMSG_HDR.pack(NLMSG_HDR.size + len(payload), SOCK_DIAG_BY_FAMILY,
+                            NLM_F_REQUEST | NLM_F_DUMP, seq, 0)
+    sock.send(header + payload)
+
+    counts = {}
+    while True:
+        data = sock.recv(1 << 16)
+        offset = 0
+        while offset + NLMSG_HDR.size <= len(data):
+            msg_len, msg_type, _, _, _ = NLMSG_HDR.unpack_from(data, offset)
+            if msg_type == NLMSG_DONE:
+                return counts
+            if msg_type == NLMSG_ERROR:
+                (errno,) = struct.unpack_from('=i', data, offset + NLMSG_HDR.size)
+                if errno == 0:
+                    return counts
+                raise OSError(-errno, os.strerror(-errno))
+            # inet_diag_msg 第二个字节是 idiag_state
+            state = data[offset + NLMSG_HDR.size + 1]
+            counts[state] = counts.get(state, 0) + 1
+            offset += (msg_len + 3) & ~3
+            if msg_len == 0:
+                break
+
+
+def count_states_netlink():
+    """通过 sock_diag netlink 统计连接状态"""
+    summary = empty_summary()
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_SOCK_DIAG)
+    try:
+        for seq, (family, protocol, name) in enumerate(PROTOCOLS, start=1):
+            try:
+                counts = _dump_state_counts(sock, family, protocol, seq)
+            except OSError:
+                # 内核未加载对应协议的diag模块（如udp_diag）时退回 /proc
+                summary_proc = empty_summary()
+                _count_proc_table(summary_proc, name)
+                for key, value in summary_proc.items():
+                    summary[key] += value
+                continue
+            for state, count in counts.items():
+                tcp_state = TCP_STATES.get(state) if protocol == socket.IPPROTO_TCP else None
+                _add_state(summary, tcp_state, count)
+    finally:
+        sock.close()
+    return summary
+
+
+def _count_proc_table(summary, name, proc_root='/proc/net'):
+    path = os.path.join(proc_root, name)
+    try:
+        with open(path, 'rb') as f:
+            lines = f.read().splitlines()[1:]
+    except OSError:
+        return False
+    is_tcp = name.startswith('tcp')
+    counts = {}
+    for line in lines:
+        fields = line.split(None, 4)
+        if len(fields) > 3:
+            counts[fields[3]] = counts.get(fields[3], 0) + 1
+    for state_hex, count in counts.items():
+        state = TCP_STATES.get(int(state_hex, 16)) if is_tcp else None
+        _add_state(summary, state, count)
+    return True
+
+
+def count_states_proc(proc_root='/proc/net'):
+    """批量读取 /proc/net/tcp* 与 udp* 统计连接状态"""
+    summary = empty_summary()
+    found = [_count_proc_table(summary, name, proc_root) for _, _, name in PROTOCOLS]
+    if not any(found):
+        raise OSError(f"{proc_root} 下没有可读取的套接字表")
+    return summary
+
+
+BACKENDS = {
+    'netlink': count_states_netlink,
+    'proc': count_states_proc,
+}
+
+
+def count_connection_states(backend='netlink'):
+    """按指定后端统计，失败时抛出 OSError 由调用方决定是否回退"""
+    return BACKENDS[backend]()
+
+
+if __name__ == "__main__":
+    for name, func in BACKENDS.items():
+        print(f"{name}: {func()}")
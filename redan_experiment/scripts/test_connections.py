@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
+import asyncio
+import os
 import requests
-import time
 import socket
-import threading
+
+from connection_monitor import ConnectionMonitor
+
+SERVER_IP = os.environ.get('SERVER_IP', '10.0.0.10')
 
 def test_http_connection():
     """测试HTTP连接"""
     try:
-        response = requests.get('http://10.0.0.10', timeout=5)
+        response = requests.get(f'http://{SERVER_IP}', timeout=5)
         print(f"[HTTP] 连接成功，状态码: {response.status_code}")
         return True
     except Exception as e:
@@ -19,7 +23,7 @@ def test_ssh_connection():
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.settimeout(5)
-        result = sock.connect_ex(('10.0.0.10', 22))
+        result = sock.connect_ex((SERVER_IP, 22))
         sock.close()
         
         if result == 0:
@@ -32,13 +36,15 @@ def test_ssh_connection():
         print(f"[SSH] 连接错误: {e}")
         return False
 
-def continuous_test():
-    """持续测试连接"""
-    while True:
-        print("\n[*] 执行连接测试...")
-        test_http_connection()
-        test_ssh_connection()
-        time.sleep(10)
+def continuous_test(output_dir='/output', interval=0.2, duration=None):
+    """持续测试连接：长连接 + 亚秒级心跳，结果写入 connection_monitor.json"""
+    monitor = ConnectionMonitor(SERVER_IP, [('http', 80, 'http'), ('ssh', 22, 'tcp')],
+                                output_dir=output_dir, interval=interval)
+    print(f"[*] 持续监控 {SERVER_IP} 的 HTTP/SSH 服务（心跳间隔 {interval}s）...")
+    try:
+        asyncio.run(monitor.run(duration))
+    except KeyboardInterrupt:
+        print("\n[*] 监控已停止")
 
 if __name__ == "__main__":
     continuous_test()